@@ -1,69 +1,189 @@
 import cv2
 import time
 import os
+import denoise
+import gate
+import document
+import calibrate
+import frame_source
+import tracing
+from streamit import find_max_resolution
 
-def capture_photo():
+# Capture size as WIDTHxHEIGHT, or 'max' for the largest the camera offers
+# (large captures are sent as tiles, see tiling.py)
+CAPTURE_RESOLUTION = os.getenv('CAPTURE_RESOLUTION', '1280x720')
+
+def set_resolution(cap, resolution=None):
+    resolution = resolution or CAPTURE_RESOLUTION
+    if resolution == 'max':
+        width, height = find_max_resolution(cap)
+    else:
+        width, height = (int(n) for n in resolution.lower().split('x'))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    print(f"Camera resolution: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
+
+def open_camera(device=None, buffers=None):
+    """Open the frame source (FRAME_SOURCE by default). A camera gets its
+    calibrated (or known good) settings and is read until frames settle."""
     print("Opening camera...")
-    cap = cv2.VideoCapture(0)
-    
+    # Enough buffers for a whole burst plus the frame being read
+    cap = frame_source.open_source(device, buffers=buffers or denoise.BURST_FRAMES + 2)
+
     if not cap.isOpened():
         print("Failed to open camera")
+        return None
+
+    if not cap.is_device:
+        print(f"Reading frames from {type(cap).__name__}")
+        return cap
+
+    # Set resolution and this camera's saved profile (see calibrate.py)
+    print("\nConfiguring camera settings...")
+    set_resolution(cap)
+    settings = calibrate.load_profile(cap.index)
+    if settings is None:
+        print("No calibration profile for this camera, using defaults (run calibrate.py)")
+        settings = calibrate.DEFAULT_SETTINGS
+    calibrate.apply_settings(cap, settings)
+
+    # Read until frames stop changing instead of sleeping a fixed time
+    print("Waiting for frames to settle...")
+    stable, elapsed = calibrate.wait_stable(cap, timeout=8.0)
+    print(f"Camera {'settled' if stable else 'still settling'} after {elapsed:.1f}s")
+
+    return cap
+
+def denoise_frame(frame, mode=None):
+    """Apply the configured denoise mode (DENOISE_MODE, default nlm)."""
+    return denoise.denoise(frame, mode)
+
+def make_timestamp():
+    """Timestamp for image filenames, with milliseconds since a warm camera
+    can take more than one shot per second."""
+    now = time.time()
+    return time.strftime("%Y%m%d_%H%M%S", time.localtime(now)) + f"_{int(now * 1000) % 1000:03d}"
+
+def ensure_directories(directories=('ToBackup', 'ToClaude')):
+    # Create directories if they don't exist
+    for directory in directories:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+            print(f"\nCreated directory: {directory}")
+
+def hidden_path(path):
+    """Dot-prefixed sibling of path; watchers ignore it until it is renamed."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '.' + name)
+
+def atomic_imwrite(path, image):
+    """Write an image under a hidden name, then rename it into place so
+    readers never see a half-written file."""
+    temp_path = hidden_path(path)
+    if not cv2.imwrite(temp_path, image):
+        raise IOError(f"Failed to write {path}")
+    os.replace(temp_path, path)
+
+def atomic_write_bytes(path, data):
+    """Same temp-file-plus-rename protocol for already encoded bytes."""
+    temp_path = hidden_path(path)
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def save_backup(frame, timestamp=None):
+    """Write a full resolution frame to ToBackup as a lossless PNG."""
+    ensure_directories(['ToBackup'])
+    backup_path = f'ToBackup/image_{timestamp or make_timestamp()}.png'
+    atomic_imwrite(backup_path, frame)
+    return backup_path
+
+def save_photo(frame, denoise_mode=None):
+    """Crop, denoise a frame and save it to ToBackup and ToClaude."""
+    ensure_directories()
+
+    # Generate timestamp for filename; the file name is the capture id
+    timestamp = make_timestamp()
+    capture_id = f'image_{timestamp}'
+
+    # Crop to the screen/page first so there are fewer pixels to denoise
+    if document.DOC_ENABLED:
+        with tracing.span(capture_id, 'crop'):
+            frame, _ = document.extract_document(frame)
+
+    # Apply denoising
+    with tracing.span(capture_id, 'denoise'):
+        denoised = denoise_frame(frame, denoise_mode)
+
+    # Save to both directories with PNG format
+    backup_path = f'ToBackup/image_{timestamp}.png'
+    claude_path = f'ToClaude/image_{timestamp}.png'
+
+    with tracing.span(capture_id, 'write'):
+        atomic_imwrite(backup_path, denoised)
+        atomic_imwrite(claude_path, denoised)
+
+    print(f"\nSaved denoised image to:")
+    print(f"- {backup_path}")
+    print(f"- {claude_path}")
+    return claude_path
+
+def capture_burst(cap, count=None, method=None):
+    """Read a short burst and save the fused frame instead of a single one."""
+    count = count or denoise.BURST_FRAMES
+    method = method or denoise.BURST_METHOD
+
+    print(f"\nTaking burst of {count} frames...")
+    start = time.perf_counter()
+    frames = []
+    for _ in range(count):
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    burst_ms = (time.perf_counter() - start) * 1000
+
+    if not frames:
+        print("Failed to capture photo")
+        return None
+
+    start = time.perf_counter()
+    fused = denoise.fuse_frames(frames, method)
+    fuse_ms = (time.perf_counter() - start) * 1000
+    print(f"Burst of {len(frames)} frames in {burst_ms:.1f} ms, {method} fusion in {fuse_ms:.1f} ms")
+
+    if gate.GATE_ENABLED:
+        fused, _ = gate.gate(fused)
+        if fused is None:
+            return None
+
+    # The fused frame is already clean, skip the single frame denoise
+    return save_photo(fused, denoise_mode='off')
+
+def capture_photo():
+    cap = open_camera()
+    if cap is None:
         return
-        
+
     try:
-        # Initial camera warm-up
-        print("\nInitial camera warm-up...")
-        time.sleep(5)
-        
-        # Set resolution and our known good settings
-        print("\nConfiguring camera settings...")
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
-        cap.set(cv2.CAP_PROP_EXPOSURE, 108)
-        cap.set(cv2.CAP_PROP_GAIN, 0)
-        cap.set(cv2.CAP_PROP_SHARPNESS, 75)
-        cap.set(cv2.CAP_PROP_CONTRAST, 40)
-        
-        # Let settings stabilize
-        print("Letting settings stabilize...")
-        time.sleep(3)
-        
-        # Discard initial frames
-        print("Discarding initial frames...")
-        for _ in range(10):
-            cap.read()
-            time.sleep(0.2)
-        
-        # Create directories if they don't exist
-        for directory in ['ToBackup', 'ToClaude']:
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-                print(f"\nCreated directory: {directory}")
-        
+        if denoise.BURST_FRAMES > 1:
+            capture_burst(cap)
+            return
+
         # Take photo
         print("\nTaking photo...")
         ret, frame = cap.read()
-        if ret:
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoisingColored(frame, None, 5, 5, 7, 21)
-            
-            # Generate timestamp for filename
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            
-            # Save to both directories with PNG format
-            backup_path = f'ToBackup/image_{timestamp}.png'
-            claude_path = f'ToClaude/image_{timestamp}.png'
-            
-            cv2.imwrite(backup_path, denoised)
-            cv2.imwrite(claude_path, denoised)
-            
-            print(f"\nSaved denoised image to:")
-            print(f"- {backup_path}")
-            print(f"- {claude_path}")
-        else:
+        if not ret:
             print("Failed to capture photo")
-    
+            return
+
+        if gate.GATE_ENABLED:
+            # Retake from the still open camera instead of sending a bad frame
+            frame, _ = gate.gate(frame, retake=lambda: cap.read()[1])
+            if frame is None:
+                return
+
+        save_photo(frame)
+
     finally:
         cap.release()
         print("\nCamera released")
@@ -1,18 +1,58 @@
 import os
+import argparse
 import base64
 import time
+import threading
+from concurrent.futures import as_completed
 from datetime import datetime
 import anthropic
 from rich.console import Console
-from rich.panel import Panel
-from rich.markdown import Markdown
+from rich.progress import Progress
 from dotenv import load_dotenv
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from api_pool import ApiPool
+import payload
+import tiling
+import regiondiff
+import localocr
+import tracing
+from phash_cache import ResponseCache, CACHE_ENABLED
+from response_store import ResponseStore
 
 # Define static prompt
 STATIC_PROMPT = "You will receive an image with text on the screen, your goal is to respond with the entirety of the text that is seen to the best of your ability."
 
+# API worker pool settings (API_RATE is requests per second, 0 = unlimited).
+# Point ANTHROPIC_BASE_URL at mock_api.py to run without a real key.
+API_CONCURRENCY = int(os.getenv('API_CONCURRENCY', '4'))
+API_RATE = float(os.getenv('API_RATE', '0'))
+API_RETRIES = int(os.getenv('API_RETRIES', '5'))
+
+MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-5-sonnet-20241022')
+MAX_TOKENS = int(os.getenv('MAX_TOKENS', '1024'))
+
+# Message Batches limits for --drain --batch (the API allows 256 MB and
+# 100k requests per batch; stay under both)
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(200 * 1024 * 1024)))
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '10000'))
+BATCH_POLL_SECONDS = float(os.getenv('BATCH_POLL_SECONDS', '10'))
+
+# Stream responses token by token to the console and response store
+API_STREAM = os.getenv('API_STREAM', '0') == '1'
+
+def is_retryable(error):
+    """Retry connection errors, 429s and 5xx, honouring retry-after."""
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code == 429 or error.status_code >= 500:
+            try:
+                return float(error.response.headers.get('retry-after', '')) or True
+            except ValueError:
+                return True
+    return False
+
 class PhotoProcessor:
     def __init__(self):
         # Load environment variables
@@ -26,93 +66,479 @@ class PhotoProcessor:
         # Initialize console for rich output
         self.console = Console()
         
-        # Create response directory if it doesn't exist
-        if not os.path.exists("response"):
-            os.makedirs("response")
-            
-        # Initialize counter for response files
-        self.counter = len([f for f in os.listdir("response") if f.endswith('.txt')])
+        # Responses go to the SQLite store (export response_NNN.txt files
+        # with `python response_store.py export`)
+        self.store = ResponseStore()
+
+        # One client for every request so its HTTP connection pool is reused;
+        # retries are handled by the pool below
+        self.client = anthropic.Anthropic(api_key=self.api_key, max_retries=0)
+        self.pool = ApiPool(
+            concurrency=API_CONCURRENCY,
+            rate=API_RATE,
+            retries=API_RETRIES,
+            is_retryable=is_retryable,
+            on_retry=self.on_retry,
+        )
+
+        # Perceptual hash cache so re-shot screens skip the API (CACHE_ENABLED=1)
+        self.cache = ResponseCache() if CACHE_ENABLED else None
+
+        # Optional Tesseract first pass; only doubtful text goes to the API
+        self.router = localocr.LocalRouter(
+            log=lambda message: self.console.print(f"[blue]{message}[/blue]")
+        ) if localocr.LOCAL_OCR else None
+
+        # Differential mode: only changed regions of a watched screen are sent
+        self.screen = regiondiff.ScreenDiff() if regiondiff.REGION_DIFF else None
+
+    def on_retry(self, error, attempt, delay):
+        self.console.print(f"[yellow]API error ({str(error)}), retry {attempt}/{API_RETRIES} in {delay:.1f}s[/yellow]")
+
+    def list_backlog(self, directory="ToClaude"):
+        """All finished photos in directory, oldest first."""
+        photos = [os.path.join(directory, f) for f in os.listdir(directory) if is_photo(f)]
+        return sorted(photos, key=os.path.getmtime)
 
     def get_latest_photo(self):
         """Get the most recent photo from the ToClaude directory."""
-        photos = [f for f in os.listdir("ToClaude") if f.endswith(('.png', '.jpg', '.jpeg'))]
+        photos = self.list_backlog()
         if not photos:
             return None
-        return os.path.join("ToClaude", photos[0])
+        return photos[-1]
 
-    def send_to_claude(self, image_path, prompt):
-        """Send image to Claude API and save response."""
-        try:
-            # Read and encode image
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode("utf-8")
-
-            # Initialize Claude client
-            client = anthropic.Anthropic(api_key=self.api_key)
-
-            # Send request to Claude
-            message = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1024,
-                messages=[
+    def build_messages(self, image_data, media_type, prompt):
+        return [
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/png",
-                                    "data": image_data,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ],
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": image_data,
+                        },
+                    },
+                    {
+                        "type": "text",
+                        "text": prompt
                     }
                 ],
+            }
+        ]
+
+    def request(self, image_data, media_type, prompt, metrics=None):
+        """Send base64 encoded image data to Claude and return the response text."""
+        start = time.perf_counter()
+
+        # Send request to Claude (rate limited and retried by the pool)
+        message = self.pool.run(
+            self.client.messages.create,
+            model=MODEL,
+            max_tokens=MAX_TOKENS,
+            messages=self.build_messages(image_data, media_type, prompt),
+        )
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.console.print(f"[dim]Sent {len(image_data) / 1024:.0f} KB ({media_type}), request took {elapsed_ms:.0f} ms[/dim]")
+        if metrics is not None:
+            metrics.update(request_ms=elapsed_ms, bytes_sent=len(image_data),
+                           input_tokens=message.usage.input_tokens,
+                           output_tokens=message.usage.output_tokens)
+        return message.content[0].text
+
+    def stream_request(self, image_data, media_type, prompt, response_id, metrics=None):
+        """Stream the response to the console and the store as it arrives."""
+        start = time.perf_counter()
+
+        def attempt():
+            ttft_ms = None
+            parts = []
+            with self.client.messages.stream(
+                model=MODEL,
+                max_tokens=MAX_TOKENS,
+                messages=self.build_messages(image_data, media_type, prompt),
+            ) as stream:
+                try:
+                    for text in stream.text_stream:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - start) * 1000
+                            self.console.print(f"\n[dim]Time to first token: {ttft_ms:.0f} ms[/dim]")
+                        parts.append(text)
+                        self.console.out(text, end="", highlight=False)
+                        self.store.append(response_id, text)
+                except Exception as e:
+                    # Retrying after partial output would duplicate text
+                    if parts:
+                        raise RuntimeError(f"Stream interrupted after {len(parts)} chunks: {e}") from e
+                    raise
+                message = stream.get_final_message()
+            return "".join(parts), ttft_ms, message
+
+        text, ttft_ms, message = self.pool.run(attempt)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.console.print(f"\n[dim]Sent {len(image_data) / 1024:.0f} KB ({media_type}), streamed in {elapsed_ms:.0f} ms[/dim]")
+        if metrics is not None:
+            metrics.update(request_ms=elapsed_ms, ttft_ms=ttft_ms, bytes_sent=len(image_data),
+                           input_tokens=message.usage.input_tokens,
+                           output_tokens=message.usage.output_tokens)
+        return text
+
+    def tiled_request(self, tiles, metrics=None):
+        """Transcribe tiles (rows of (bytes, media_type)) concurrently and merge them."""
+        start = time.perf_counter()
+        tile_metrics = []
+
+        def request_tile(image_bytes, media_type):
+            tile = {}
+            tile_metrics.append(tile)
+            image_data = base64.b64encode(image_bytes).decode("utf-8")
+            return self.request(image_data, media_type, tiling.TILE_PROMPT, tile)
+
+        count = sum(len(row) for row in tiles)
+        self.console.print(f"[cyan]Sending {count} tiles ({len(tiles)} rows)...[/cyan]")
+        text = tiling.transcribe(tiles, request_tile)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.console.print(f"[dim]{count} tiles transcribed and merged in {elapsed_ms:.0f} ms[/dim]")
+        if metrics is not None:
+            metrics["request_ms"] = elapsed_ms
+            for name in ("bytes_sent", "input_tokens", "output_tokens"):
+                metrics[name] = sum(tile.get(name, 0) for tile in tile_metrics)
+        return text
+
+    def diff_request(self, frame, response_id=None, metrics=None):
+        """Transcribe only what changed since the last capture (REGION_DIFF)."""
+        start = time.perf_counter()
+        tile_metrics = []
+
+        def request_block(image_bytes, media_type):
+            block = {}
+            tile_metrics.append(block)
+            image_data = base64.b64encode(image_bytes).decode("utf-8")
+            return self.request(image_data, media_type, regiondiff.BLOCK_PROMPT, block)
+
+        text, stats = self.screen.transcribe(
+            frame, request_block, log=lambda message: self.console.print(f"[cyan]{message}[/cyan]")
+        )
+        if response_id:
+            self.console.out(text, highlight=False)
+            self.store.append(response_id, text)
+
+        if metrics is not None:
+            metrics["request_ms"] = (time.perf_counter() - start) * 1000
+            for name in ("bytes_sent", "input_tokens", "output_tokens"):
+                metrics[name] = sum(block.get(name, 0) for block in tile_metrics)
+        return text
+
+    def cached_request(self, image_hash, image_data, media_type, prompt, response_id=None, metrics=None,
+                       tiles=None):
+        """Like request, but answers near-duplicate images from the cache.
+
+        With a response_id the response is streamed into that stored
+        response (API_STREAM). With tiles the tiles are sent instead of
+        image_data and their merged text is the response.
+        """
+        text = None
+        if self.cache is not None and image_hash is not None:
+            text, distance = self.cache.lookup(image_hash, prompt)
+            stats = self.cache.stats()
+            if text is not None:
+                self.console.print(f"[magenta]Cache hit (distance {distance}), skipped API call "
+                                   f"({stats['hits']} hits / {stats['misses']} misses)[/magenta]")
+                if response_id:
+                    self.console.out(text, highlight=False)
+                    self.store.append(response_id, text)
+                return text
+
+        def remote():
+            if tiles:
+                return self.tiled_request(tiles, metrics)
+            if response_id:
+                return self.stream_request(image_data, media_type, prompt, response_id, metrics)
+            return self.request(image_data, media_type, prompt, metrics)
+
+        if self.router is not None:
+            text, route = self.router.route(
+                base64.b64decode(image_data), remote,
+                lambda data, region_type: self.request(base64.b64encode(data).decode("utf-8"), region_type,
+                                                       localocr.REGION_PROMPT),
             )
+            if metrics is not None:
+                metrics["route"] = route
+            # Only a full streamed request has already written the text
+            if response_id and not (route == "remote" and not tiles):
+                self.console.out(text, highlight=False)
+                self.store.append(response_id, text)
+        else:
+            text = remote()
+            if tiles and response_id:
+                self.console.out(text, highlight=False)
+                self.store.append(response_id, text)
 
-            # Save response to file
-            self.counter += 1
-            response_file = f"response/response_{self.counter:03d}.txt"
-            with open(response_file, 'w', encoding='utf-8') as f:
-                f.write(message.content[0].text)
+        if self.cache is not None and image_hash is not None:
+            self.cache.store(image_hash, prompt, text)
+        return text
 
-            # Display response in terminal
-            self.console.print("\n")
-            self.console.print(Panel(
-                Markdown(message.content[0].text),
-                title=f"Claude's Response (saved to {response_file})",
-                border_style="blue"
-            ))
+    def begin_response(self, capture_id=None, image_hash=None, source=None):
+        """Create an empty response to stream into and return its id."""
+        return self.store.create(capture_id, image_hash, source)
+
+    def save_response(self, text, response_id=None, capture_id=None, image_hash=None,
+                      source=None, metrics=None):
+        """Save (or complete a streamed) response in the store and return its id."""
+        if response_id is None:
+            return self.store.add(text, capture_id, image_hash, source, metrics)
+        self.store.finish(response_id, text, metrics)
+        return response_id
+
+    def display_response(self, text, response_id, streamed=False):
+        """Display response in terminal."""
+        if streamed:
+            # The text is already on screen
+            self.console.print(f"[blue]Claude's Response saved as response #{response_id}[/blue]")
+            return
+
+        # Markdown rendering pulls in markdown-it and pygments; only load it
+        # for the first panel rather than at startup
+        from rich.panel import Panel
+        from rich.markdown import Markdown
+        self.console.print("\n")
+        self.console.print(Panel(
+            Markdown(text),
+            title=f"Claude's Response (saved as response #{response_id})",
+            border_style="blue"
+        ))
+
+    def send_to_claude(self, image_path, prompt):
+        """Send image to Claude API and save response."""
+        response_id = None
+        # Files are named after the capture, so spans line up with CamBro's
+        capture_id = os.path.splitext(os.path.basename(image_path))[0]
+        try:
+            # Time from the file landing in ToClaude to us starting on it
+            tracing.record(capture_id, "pickup", os.path.getmtime(image_path))
+
+            # Read, shrink/re-encode as configured and base64 encode the image
+            image_bytes, media_type = payload.prepare_file(image_path)
+            image_data = base64.b64encode(image_bytes).decode("utf-8")
+            tiles = tiling.load_tiles(image_path) if tiling.TILE_ENABLED else None
+            image_hash = self.cache.hash_file(image_path) if self.cache else None
+            hash_hex = f"{image_hash:016x}" if image_hash is not None else None
+
+            metrics = {}
+            response_id = (self.begin_response(capture_id, hash_hex, image_path) if API_STREAM else None)
+            with tracing.span(capture_id, "api"):
+                if self.screen is not None:
+                    text = self.diff_request(regiondiff.read_image(image_path), response_id, metrics)
+                else:
+                    text = self.cached_request(image_hash, image_data, media_type, prompt, response_id,
+                                               metrics, tiles)
+            with tracing.span(capture_id, "persist"):
+                response_id = self.save_response(text, response_id, capture_id, hash_hex,
+                                                 source=image_path, metrics=metrics)
+            self.display_response(text, response_id, streamed=API_STREAM)
 
             # Clean up the processed image
             os.remove(image_path)
             self.console.print("[green]Image processed and deleted successfully[/green]")
+            return response_id
 
         except Exception as e:
-            self.console.print(f"[red]Error: {str(e)}[/red]")
+            if response_id:
+                self.store.fail(response_id, e)
+            self.console.print(f"[red]Error: {str(e)} (left {image_path} in place)[/red]")
+            return None
+
+    def submit(self, image_path, prompt):
+        """Process an image on the API worker pool without blocking the caller."""
+        return self.pool.executor.submit(self.send_to_claude, image_path, prompt)
+
+    def drain(self, prompt=STATIC_PROMPT, directory="ToClaude"):
+        """Process the whole backlog, oldest first, at API_CONCURRENCY."""
+        backlog = self.list_backlog(directory)
+        if not backlog:
+            self.console.print(f"No images waiting in {directory}/")
+            return
+
+        self.console.print(f"Draining {len(backlog)} images from {directory}/ "
+                           f"with {API_CONCURRENCY} concurrent requests...")
+        start = time.perf_counter()
+        failed = 0
+
+        futures = [self.submit(path, prompt) for path in backlog]
+        with Progress(console=self.console) as progress:
+            task = progress.add_task("Draining", total=len(backlog))
+            for future in as_completed(futures):
+                if future.result() is None:
+                    failed += 1
+                progress.advance(task)
+
+        self.report_drain(len(backlog), failed, time.perf_counter() - start)
+
+    def drain_batch(self, prompt=STATIC_PROMPT, directory="ToClaude"):
+        """Submit the whole backlog through the Message Batches API.
+
+        Cheaper than live requests and not subject to per-minute rate
+        limits, at the cost of results arriving minutes (up to a day) later.
+        """
+        backlog = self.list_backlog(directory)
+        if not backlog:
+            self.console.print(f"No images waiting in {directory}/")
+            return
+
+        self.console.print(f"Draining {len(backlog)} images from {directory}/ through the Batches API...")
+        start = time.perf_counter()
+        failed = 0
+
+        chunk, chunk_bytes = [], 0
+        for path in backlog:
+            try:
+                params, size = self.batch_params(path, prompt)
+            except Exception as e:
+                self.console.print(f"[red]Error: {str(e)} (left {path} in place)[/red]")
+                failed += 1
+                continue
+            if chunk and (chunk_bytes + size > BATCH_MAX_BYTES or len(chunk) >= BATCH_MAX_REQUESTS):
+                failed += self.run_batch(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append((path, params))
+            chunk_bytes += size
+        if chunk:
+            failed += self.run_batch(chunk)
+
+        self.report_drain(len(backlog), failed, time.perf_counter() - start)
+
+    def batch_params(self, path, prompt):
+        """Returns (request params, encoded size) for one image."""
+        image_bytes, media_type = payload.prepare_file(path)
+        image_data = base64.b64encode(image_bytes).decode("utf-8")
+        params = {
+            "model": MODEL,
+            "max_tokens": MAX_TOKENS,
+            "messages": self.build_messages(image_data, media_type, prompt),
+        }
+        return params, len(image_data)
+
+    def run_batch(self, chunk):
+        """Create one batch, wait for it to end and save its results.
+
+        Returns the number of images that failed.
+        """
+        paths = {}
+        requests = []
+        for index, (path, params) in enumerate(chunk):
+            custom_id = f"img-{index:05d}"
+            paths[custom_id] = path
+            requests.append({"custom_id": custom_id, "params": params})
+
+        batch = self.pool.run(self.client.messages.batches.create, requests=requests)
+        self.console.print(f"Created batch {batch.id} with {len(chunk)} requests")
+
+        with Progress(console=self.console) as progress:
+            task = progress.add_task(f"Batch {batch.id}", total=len(chunk))
+            while batch.processing_status != "ended":
+                time.sleep(BATCH_POLL_SECONDS)
+                batch = self.pool.run(self.client.messages.batches.retrieve, batch.id)
+                counts = batch.request_counts
+                progress.update(task, completed=counts.succeeded + counts.errored + counts.canceled + counts.expired)
+
+        failed = 0
+        for entry in self.pool.run(self.client.messages.batches.results, batch.id):
+            path = paths[entry.custom_id]
+            if entry.result.type != "succeeded":
+                failed += 1
+                self.console.print(f"[red]Batch request for {path} {entry.result.type} (left in place)[/red]")
+                continue
+
+            message = entry.result.message
+            text = message.content[0].text
+            response_id = self.save_response(text, source=path, metrics={
+                "input_tokens": message.usage.input_tokens,
+                "output_tokens": message.usage.output_tokens,
+            })
+            self.display_response(text, response_id)
+            os.remove(path)
+        return failed
+
+    def report_drain(self, total, failed, elapsed):
+        rate = total / elapsed if elapsed else 0.0
+        self.console.print(f"[green]Drained {total - failed}/{total} images in {elapsed:.1f}s "
+                           f"({rate:.2f} images/s), {failed} failed[/green]")
+        self.report_routing()
+
+    def report_routing(self):
+        """How many images the local OCR pass kept away from the API."""
+        if self.router is not None:
+            self.console.print(f"[dim]{self.router.stats.summary()}[/dim]")
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+def is_photo(path):
+    """Finished photo: an image extension and not a hidden temp file."""
+    name = os.path.basename(path)
+    return not name.startswith('.') and name.endswith(('.png', '.jpg', '.jpeg'))
 
 class PhotoHandler(FileSystemEventHandler):
+    """Queues photos once they are complete.
+
+    CamBro writes under a hidden name and renames into place, which shows up
+    as a move; other writers are picked up when they close the file. Either
+    way the file is complete, so no settle delay is needed, and the observer
+    thread only hands the path to the worker pool.
+    """
+
     def __init__(self, processor):
         self.processor = processor
+        self.pending = set()
+        self.lock = threading.Lock()
 
-    def on_created(self, event):
-        if (not event.is_directory and 
-            event.src_path.endswith(('.png', '.jpg', '.jpeg')) and 
-            os.path.exists(event.src_path)):  # Verify file still exists
-            # Wait a brief moment to ensure the file is fully written
-            time.sleep(1)
-            
-            # Process the image with static prompt
-            self.processor.send_to_claude(event.src_path, STATIC_PROMPT)
+    def queue_photo(self, path):
+        if not is_photo(path) or not os.path.exists(path):  # Verify file still exists
+            return
+        with self.lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+
+        # Process the image with static prompt on the worker pool
+        future = self.processor.submit(path, STATIC_PROMPT)
+        future.add_done_callback(lambda _: self.done(path))
+
+    def done(self, path):
+        with self.lock:
+            self.pending.discard(path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.queue_photo(event.dest_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.queue_photo(event.src_path)
 
 def main():
+    parser = argparse.ArgumentParser(description="Send photos in ToClaude to Claude")
+    parser.add_argument("--drain", action="store_true", help="process the whole backlog and exit")
+    parser.add_argument("--batch", action="store_true", help="with --drain, use the Message Batches API")
+    args = parser.parse_args()
+
     # Create processor
     processor = PhotoProcessor()
+
+    if args.drain:
+        try:
+            if args.batch:
+                processor.drain_batch()
+            else:
+                processor.drain()
+        except KeyboardInterrupt:
+            print("\nStopping drain...")
+        processor.shutdown()
+        return
     
     # Set up file system observer
     event_handler = PhotoHandler(processor)
@@ -124,10 +550,12 @@ def main():
     print("Press Ctrl+C to stop")
 
     try:
-        # Check if there's already an image in the folder
-        existing_photo = processor.get_latest_photo()
-        if existing_photo:
-            processor.send_to_claude(existing_photo, STATIC_PROMPT)
+        # Queue anything left over from a crash or offline period, oldest first
+        backlog = processor.list_backlog()
+        if backlog:
+            print(f"Queueing {len(backlog)} images already in ToClaude...")
+        for path in backlog:
+            event_handler.queue_photo(path)
 
         # Keep the script running
         while True:
@@ -136,6 +564,9 @@ def main():
         observer.stop()
         print("\nStopping image processor...")
     observer.join()
+    processor.shutdown()
+    # After in-flight images have finished
+    processor.report_routing()
 
 if __name__ == "__main__":
     main()
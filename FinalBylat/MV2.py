@@ -1,14 +1,28 @@
+import asyncio
 import subprocess
 import time
 import os
-import glob
 import signal
 import evdev
 from evdev import InputDevice, categorize, ecodes
 from rich.console import Console
+from camera_daemon import CameraDaemon
+from ClaudeCamd import PhotoProcessor
+from pipeline import Job, build_pipeline
+import tracing
 
 console = Console()
 
+# Gamepad handling: presses closer together than the debounce are contact
+# bounce, holding the button longer than GAMEPAD_HOLD_MS keeps capturing
+# every GAMEPAD_HOLD_INTERVAL_MS until it is released.
+BUTTON = 290  # BTN_THUMB
+DEBOUNCE_MS = float(os.getenv('GAMEPAD_DEBOUNCE_MS', '50'))
+HOLD_MS = float(os.getenv('GAMEPAD_HOLD_MS', '400'))
+HOLD_INTERVAL_MS = float(os.getenv('GAMEPAD_HOLD_INTERVAL_MS', '500'))
+# Held-button captures pause while this many are still in the pipeline
+MAX_PENDING = int(os.getenv('GAMEPAD_MAX_PENDING', '8'))
+
 def find_gamepad():
     """Find the USB gamepad."""
     devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
@@ -17,6 +31,75 @@ def find_gamepad():
             return device
     return None
 
+class ButtonHandler:
+    """Turns button events into pipeline jobs without ever waiting on them."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.last_press = 0.0
+        self.last_release = None
+        self.hold_task = None
+        self.pending = []
+
+    def in_flight(self):
+        self.pending = [job for job in self.pending if not job.done.is_set()]
+        return len(self.pending)
+
+    def queue_capture(self, pressed_at):
+        # The press span runs from the kernel's event time to the queue
+        job = Job()
+        tracing.record(job.capture_id, "press", pressed_at)
+        self.pipeline.submit(job)
+        self.pending.append(job)
+        return job
+
+    async def hold(self, delay_ms=HOLD_MS):
+        """Capture continuously while the button stays down."""
+        await asyncio.sleep(delay_ms / 1000)
+        console.print("[yellow]Button held - burst capturing until release...[/yellow]")
+        while True:
+            if self.in_flight() < MAX_PENDING:
+                job = self.queue_capture(time.time())
+                console.print(f"[green]Queued burst capture {job.capture_id}[/green]")
+            await asyncio.sleep(HOLD_INTERVAL_MS / 1000)
+
+    def on_event(self, event):
+        if event.type != ecodes.EV_KEY or event.code != BUTTON:
+            return
+
+        if event.value == 1:  # Button press (not release or autorepeat)
+            pressed_at = event.timestamp()
+            if self.last_release is not None and (pressed_at - self.last_release) * 1000 < DEBOUNCE_MS:
+                # The release was contact bounce; the button is still held
+                self.last_release = None
+                held_ms = (pressed_at - self.last_press) * 1000
+                self.hold_task = asyncio.get_running_loop().create_task(self.hold(max(0.0, HOLD_MS - held_ms)))
+                return
+            if (pressed_at - self.last_press) * 1000 < DEBOUNCE_MS:
+                return
+            self.last_press = pressed_at
+            self.last_release = None
+
+            console.print("\n[yellow]Button pressed - Taking photo...[/yellow]")
+            job = self.queue_capture(pressed_at)
+            console.print(f"[green]Queued capture {job.capture_id} ({self.in_flight()} in flight) "
+                          f"- ready for next photo![/green]")
+            if self.hold_task:
+                self.hold_task.cancel()   # a release we never saw
+            self.hold_task = asyncio.get_running_loop().create_task(self.hold())
+
+        elif event.value == 0:  # Release ends a hold, unless a press follows within DEBOUNCE_MS
+            self.last_release = event.timestamp()
+            if self.hold_task:
+                self.hold_task.cancel()
+                self.hold_task = None
+
+async def watch_gamepad(gamepad, pipeline):
+    """Read gamepad events as they arrive; captures run on pipeline threads."""
+    handler = ButtonHandler(pipeline)
+    async for event in gamepad.async_read_loop():
+        handler.on_event(event)
+
 def run_system():
     # Find and setup gamepad
     gamepad = find_gamepad()
@@ -26,34 +109,31 @@ def run_system():
     
     console.print(f"[green]Found gamepad: {gamepad.name}[/green]")
     
+    # Open the camera once and keep it warm for every press
+    console.print("\nStarting camera...")
+    camera = CameraDaemon()
+    try:
+        camera.start()
+    except RuntimeError as e:
+        console.print(f"[red]{e}[/red]")
+        return
+    
     # Start presentation viewer in background
     console.print("\nStarting Presentation viewer...")
     presentation = subprocess.Popen(['python', 'Presentation.py'])
     
-    # Start Claude in background
-    console.print("Starting Claude processor...")
-    claude = subprocess.Popen(['python', 'ClaudeCamd.py'])
+    # Start the capture -> Claude pipeline in this process
+    console.print("Starting Claude pipeline...")
+    pipeline = build_pipeline(camera, PhotoProcessor())
+    pipeline.start()
     
     console.print("\n[bold green]System ready![/bold green]")
-    console.print("Press button 290 to take a photo")
+    console.print("Press button 290 to take a photo, hold it to keep taking photos")
     console.print("Press Ctrl+C to quit")
     
     try:
         # Monitor gamepad events
-        for event in gamepad.read_loop():
-            if event.type == ecodes.EV_KEY and event.code == 290:  # BTN_THUMB
-                if event.value == 1:  # Button press (not release)
-                    console.print("\n[yellow]Button pressed - Taking photo...[/yellow]")
-                    
-                    # Take new photo
-                    subprocess.run(['python', 'CamBro.py'])
-                    
-                    # Wait for image to be processed
-                    while glob.glob("ToClaude/*.png"):
-                        console.print("[cyan]Waiting for Claude to process image...[/cyan]")
-                        time.sleep(1)
-                    
-                    console.print("[green]Ready for next photo![/green]")
+        asyncio.run(watch_gamepad(gamepad, pipeline))
     
     except KeyboardInterrupt:
         console.print("\n[yellow]Shutting down system...[/yellow]")
@@ -61,9 +141,11 @@ def run_system():
         console.print(f"\n[red]Error: {str(e)}[/red]")
     finally:
         # Clean up processes
-        console.print("Stopping Claude processor...")
-        claude.terminate()
-        claude.wait()
+        console.print("Stopping Claude pipeline...")
+        pipeline.stop()
+        
+        console.print("Stopping camera...")
+        camera.stop()
         
         console.print("Stopping Presentation viewer...")
         presentation.terminate()
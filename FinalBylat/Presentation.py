@@ -1,9 +1,22 @@
 import tkinter as tk
 from tkinter import ttk
 import os
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 import time
+from collections import OrderedDict
+from response_store import ResponseStore
+import tracing
+
+# How many responses the list shows at once and how many bodies stay cached
+PAGE_SIZE = int(os.getenv('VIEWER_PAGE_SIZE', '200'))
+BODY_CACHE_SIZE = int(os.getenv('VIEWER_CACHE_SIZE', '64'))
+POLL_MS = 100
+
+def response_label(row):
+    """One line list entry: id, time and a preview of the text."""
+    created = time.strftime("%H:%M:%S", time.localtime(row['created_at']))
+    preview = " ".join((row['preview'] or "").split())
+    marker = "..." if row['status'] == 'streaming' else ""
+    return f"#{row['id']} {created}{marker} {preview}"
 
 class ResponseViewer(tk.Tk):
     def __init__(self):
@@ -12,6 +25,23 @@ class ResponseViewer(tk.Tk):
         self.title("Claude Response Viewer")
         self.geometry("800x600")
 
+        # Responses come from the SQLite store; the listbox only shows one
+        # page of them (or one page of search results)
+        self.store = ResponseStore()
+        self.total = 0
+        self.last_id = 0
+        self.page_start = 0
+        self.page_ids = []
+        self.follow_latest = True
+        self.searching = False
+        self.shown_id = None
+        self.shown_updated = None
+        # Entries on the visible page still streaming: id -> label shown
+        self.streaming = {}
+
+        # Recently viewed complete response bodies: id -> text
+        self.body_cache = OrderedDict()
+
         # Create main container
         self.main_container = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
         self.main_container.pack(fill=tk.BOTH, expand=True)
@@ -20,8 +50,24 @@ class ResponseViewer(tk.Tk):
         self.sidebar = ttk.Frame(self.main_container)
         self.main_container.add(self.sidebar)
 
+        # Create search box
+        self.search_bar = ttk.Frame(self.sidebar)
+        self.search_bar.pack(fill=tk.X)
+        self.search_entry = ttk.Entry(self.search_bar)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_entry.bind('<Return>', self.on_search)
+        ttk.Button(self.search_bar, text="Clear", command=self.clear_search).pack(side=tk.RIGHT)
+
+        # Create paging controls
+        self.pager = ttk.Frame(self.sidebar)
+        self.pager.pack(fill=tk.X)
+        ttk.Button(self.pager, text="< Older", command=self.older_page).pack(side=tk.LEFT)
+        ttk.Button(self.pager, text="Newer >", command=self.newer_page).pack(side=tk.RIGHT)
+        self.page_label = ttk.Label(self.pager, anchor=tk.CENTER)
+        self.page_label.pack(fill=tk.X, expand=True)
+
         # Create response list
-        self.response_list = tk.Listbox(self.sidebar, width=30)
+        self.response_list = tk.Listbox(self.sidebar, width=40)
         self.response_list.pack(fill=tk.BOTH, expand=True)
         self.response_list.bind('<<ListboxSelect>>', self.on_select)
 
@@ -33,71 +79,192 @@ class ResponseViewer(tk.Tk):
         self.text_widget = tk.Text(self.content_frame, wrap=tk.WORD, padx=10, pady=10)
         self.text_widget.pack(fill=tk.BOTH, expand=True)
 
-        # Initialize file handler and observer
-        self.setup_file_watcher()
-        
         # Load existing responses
         self.load_responses()
 
-    def setup_file_watcher(self):
-        class ResponseHandler(FileSystemEventHandler):
-            def __init__(self, callback):
-                self.callback = callback
-
-            def on_created(self, event):
-                if not event.is_directory and event.src_path.endswith('.txt'):
-                    self.callback()
-
-        self.observer = Observer()
-        self.observer.schedule(
-            ResponseHandler(self.load_responses),
-            path="response",
-            recursive=False
-        )
-        self.observer.start()
+        # Poll the store for new and growing responses on the Tk thread
+        self.after(POLL_MS, self.poll_store)
 
     def load_responses(self):
-        # Clear current list
-        self.response_list.delete(0, tk.END)
-        
-        # Get all response files
+        """Show the latest page; only that page is read from the store."""
         try:
-            files = [f for f in os.listdir("response") if f.endswith('.txt')]
-            files.sort()  # Sort files alphabetically
-            
-            # Add to listbox
-            for file in files:
-                self.response_list.insert(tk.END, file)
-                
-            # Select the last item if it exists
-            if files:
-                self.response_list.select_set(tk.END)
-                self.response_list.event_generate('<<ListboxSelect>>')
+            self.total = self.store.count()
+            self.last_id = self.store.max_id()
         except Exception as e:
             print(f"Error loading responses: {e}")
+            return
+        self.show_latest_page()
+
+    def poll_store(self):
+        try:
+            for row in self.store.since(self.last_id):
+                self.add_response(row)
+            self.refresh_labels()
+            self.refresh_shown()
+        except Exception as e:
+            print(f"Error polling responses: {e}")
+        self.after(POLL_MS, self.poll_store)
+
+    def add_response(self, row):
+        """Append one new response without rebuilding the list."""
+        self.last_id = max(self.last_id, row['id'])
+        self.total += 1
+
+        if self.searching or not self.follow_latest:
+            self.update_page_label()
+            return
+
+        # Keep the visible page as the latest PAGE_SIZE responses
+        self.page_ids.append(row['id'])
+        self.response_list.insert(tk.END, self.track_label(row))
+        if len(self.page_ids) > PAGE_SIZE:
+            self.streaming.pop(self.page_ids.pop(0), None)
+            self.response_list.delete(0)
+            self.page_start += 1
+        self.select_last()
+        self.update_page_label()
+        # From the response being written to it being on screen
+        self.update_idletasks()
+        tracing.record(row['capture_id'], 'render', row['created_at'])
+
+    def show_rows(self, rows):
+        self.page_ids = [row['id'] for row in rows]
+        self.streaming = {}
+        self.response_list.delete(0, tk.END)
+        for row in rows:
+            self.response_list.insert(tk.END, self.track_label(row))
+
+    def track_label(self, row):
+        """List label for row, remembering it if it will still change."""
+        label = response_label(row)
+        if row['status'] == 'streaming':
+            self.streaming[row['id']] = label
+        return label
+
+    def refresh_labels(self):
+        """Update entries of streaming responses as their text arrives and
+        once they complete or fail."""
+        if not self.streaming:
+            return
+        for row in self.store.summaries(list(self.streaming)):
+            label = response_label(row)
+            if row['status'] != 'streaming':
+                del self.streaming[row['id']]
+            elif label == self.streaming[row['id']]:
+                continue
+            else:
+                self.streaming[row['id']] = label
+            index = self.page_ids.index(row['id'])
+            selected = self.response_list.selection_includes(index)
+            self.response_list.delete(index)
+            self.response_list.insert(index, label)
+            if selected:
+                self.response_list.select_set(index)
+
+    def show_page(self, start):
+        start = max(0, min(start, max(0, self.total - PAGE_SIZE)))
+        self.page_start = start
+        self.follow_latest = start + PAGE_SIZE >= self.total
+        self.show_rows(self.store.page(start, PAGE_SIZE))
+        self.update_page_label()
+
+    def show_latest_page(self):
+        self.show_page(self.total - PAGE_SIZE)
+        self.select_last()
+
+    def older_page(self):
+        if not self.searching:
+            self.show_page(self.page_start - PAGE_SIZE)
+
+    def newer_page(self):
+        if not self.searching:
+            self.show_page(self.page_start + PAGE_SIZE)
+            if self.follow_latest:
+                self.select_last()
+
+    def on_search(self, event=None):
+        query = self.search_entry.get().strip()
+        if not query:
+            self.clear_search()
+            return
+        self.searching = True
+        rows = self.store.search(query, PAGE_SIZE)
+        self.show_rows(rows)
+        self.page_label.config(text=f"{len(rows)} matches for '{query}'")
+        if rows:
+            self.response_list.select_set(0)
+            self.response_list.event_generate('<<ListboxSelect>>')
+
+    def clear_search(self):
+        self.search_entry.delete(0, tk.END)
+        self.searching = False
+        self.show_latest_page()
+
+    def update_page_label(self):
+        if self.searching:
+            return
+        end = min(self.page_start + PAGE_SIZE, self.total)
+        first = self.page_start + 1 if self.total else 0
+        self.page_label.config(text=f"{first}-{end} of {self.total}")
+
+    def select_last(self):
+        # Select the last item if it exists
+        if self.response_list.size():
+            self.response_list.selection_clear(0, tk.END)
+            self.response_list.select_set(tk.END)
+            self.response_list.see(tk.END)
+            self.response_list.event_generate('<<ListboxSelect>>')
+
+    def read_response(self, response_id):
+        """Response row, with complete bodies kept in a small LRU cache."""
+        if response_id in self.body_cache:
+            self.body_cache.move_to_end(response_id)
+            return self.body_cache[response_id]
+
+        row = self.store.get(response_id)
+        if row and row['status'] != 'streaming':
+            self.body_cache[response_id] = row
+            if len(self.body_cache) > BODY_CACHE_SIZE:
+                self.body_cache.popitem(last=False)
+        return row
+
+    def refresh_shown(self):
+        """Reload the shown response while it is still streaming."""
+        if self.shown_id is None or self.shown_id in self.body_cache:
+            return
+        row = self.read_response(self.shown_id)
+        if row and row['updated_at'] != self.shown_updated:
+            self.show_response(row)
+            self.text_widget.see(tk.END)
+
+    def show_response(self, row):
+        self.shown_id = row['id']
+        self.shown_updated = row['updated_at']
+
+        # Clear current text
+        self.text_widget.delete(1.0, tk.END)
+        self.text_widget.insert(tk.END, row['text'])
 
     def on_select(self, event):
-        # Get selected filename
+        # Get selected response
         selection = self.response_list.curselection()
         if not selection:
             return
-            
-        filename = self.response_list.get(selection[0])
-        
-        # Clear current text
-        self.text_widget.delete(1.0, tk.END)
-        
+
+        response_id = self.page_ids[selection[0]]
+
         # Load and display selected response
         try:
-            with open(os.path.join("response", filename), 'r', encoding='utf-8') as f:
-                content = f.read()
-                self.text_widget.insert(tk.END, content)
+            row = self.read_response(response_id)
+            if row is None:
+                raise KeyError(f"response #{response_id} not found")
+            self.show_response(row)
         except Exception as e:
+            self.text_widget.delete(1.0, tk.END)
             self.text_widget.insert(tk.END, f"Error loading response: {e}")
 
     def on_closing(self):
-        self.observer.stop()
-        self.observer.join()
+        self.store.close()
         self.destroy()
 
 def main():
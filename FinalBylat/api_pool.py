@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, up to `capacity` saved."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ApiPool:
+    """Thread pool for API calls with a shared rate limit and jittered retries.
+
+    `is_retryable(error)` decides which errors are retried and may return a
+    server requested delay in seconds (e.g. from retry-after) or True.
+    """
+
+    def __init__(self, concurrency=4, rate=0, retries=5, base_delay=0.5, max_delay=30,
+                 is_retryable=None, on_retry=None):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="api")
+        self.bucket = TokenBucket(rate) if rate else None
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_retryable = is_retryable or (lambda error: False)
+        self.on_retry = on_retry
+
+    def run(self, func, *args, **kwargs):
+        """Call func in the current thread, rate limited and retried."""
+        attempt = 0
+        while True:
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                retry = self.is_retryable(e)
+                if not retry or attempt >= self.retries:
+                    raise
+
+                # Full jitter backoff, but never sooner than the server asked
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if retry is not True:
+                    delay = max(delay, float(retry))
+                attempt += 1
+                if self.on_retry:
+                    self.on_retry(e, attempt, delay)
+                time.sleep(delay)
+
+    def submit(self, func, *args, **kwargs):
+        """Run func on a pool thread; returns a Future."""
+        return self.executor.submit(self.run, func, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
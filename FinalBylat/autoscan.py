@@ -0,0 +1,123 @@
+import os
+import threading
+import cv2
+
+# Hands-free scanning: watch small grayscale copies of the live frames and
+# capture once the scene has changed (a new page) and then held still.
+# Differences are mean absolute grey levels (0-255) between SCAN_WIDTH wide frames.
+SCAN_CHANGE = float(os.getenv('SCAN_CHANGE', '12'))          # vs the last capture
+SCAN_STILL = float(os.getenv('SCAN_STILL', '2.5'))           # frame to frame
+SCAN_STABLE_FRAMES = int(os.getenv('SCAN_STABLE_FRAMES', '8'))
+SCAN_DUPLICATE = float(os.getenv('SCAN_DUPLICATE', '6'))     # vs the last capture
+SCAN_WIDTH = 160
+
+def small_gray(frame, width=SCAN_WIDTH):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    scale = width / gray.shape[1]
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    # A little blur so sensor noise doesn't read as motion
+    return cv2.GaussianBlur(small, (3, 3), 0)
+
+def difference(a, b):
+    return float(cv2.absdiff(a, b).mean())
+
+class ChangeDetector:
+    """Decides, one small frame at a time, when to take a capture.
+
+    waiting: nothing new since the last capture
+    changed: the scene moved away from the last capture; capture once it
+             has been still for stable_frames frames, unless it settled back
+             to (nearly) what was last captured
+    """
+
+    def __init__(self, change=SCAN_CHANGE, still=SCAN_STILL, stable_frames=SCAN_STABLE_FRAMES,
+                 duplicate=SCAN_DUPLICATE):
+        self.change = change
+        self.still = still
+        self.stable_frames = stable_frames
+        self.duplicate = duplicate
+        self.reference = None   # small frame of the last capture
+        self.previous = None
+        self.state = 'changed'  # the first stable scene is captured too
+        self.calm = 0
+        self.captures = 0
+        self.duplicates = 0
+
+    def update(self, small):
+        """Feed the next small frame; True when a capture should be taken."""
+        previous, self.previous = self.previous, small
+        if previous is None:
+            return False
+
+        if self.state == 'waiting':
+            if difference(small, self.reference) > self.change:
+                self.state = 'changed'
+                self.calm = 0
+            return False
+
+        self.calm = self.calm + 1 if difference(small, previous) < self.still else 0
+        if self.calm < self.stable_frames:
+            return False
+
+        self.state = 'waiting'
+        # Something passed in front of the camera and the same page came back
+        if self.reference is not None and difference(small, self.reference) < self.duplicate:
+            self.duplicates += 1
+            return False
+        self.reference = small
+        self.captures += 1
+        return True
+
+def run(camera, pipeline, stop=None, log=print):
+    """Watch the camera daemon's frames and queue captures into the pipeline
+    until stop (a threading.Event) is set."""
+    stop = stop or threading.Event()
+    detector = ChangeDetector()
+    count = 0
+    log(f"Auto scan: capture after a change > {detector.change:g} held still for "
+        f"{detector.stable_frames} frames")
+    while not stop.is_set():
+        count, small = camera.next_frame(count, small_gray)
+        if small is None:
+            continue
+        if detector.update(small):
+            job = pipeline.submit()
+            log(f"Page settled, queued capture {job.capture_id} "
+                f"({detector.captures} captured, {detector.duplicates} duplicates skipped)")
+    return detector
+
+def main():
+    import subprocess
+    from camera_daemon import CameraDaemon
+    from ClaudeCamd import PhotoProcessor
+    from pipeline import build_pipeline
+
+    print("Starting camera...")
+    camera = CameraDaemon()
+    try:
+        camera.start()
+    except RuntimeError as e:
+        print(e)
+        return
+
+    print("Starting Presentation viewer...")
+    presentation = subprocess.Popen(['python', 'Presentation.py'])
+
+    print("Starting Claude pipeline...")
+    pipeline = build_pipeline(camera, PhotoProcessor())
+    pipeline.start()
+
+    print("\nTurn pages in front of the camera; Ctrl+C to quit")
+    try:
+        run(camera, pipeline)
+    except KeyboardInterrupt:
+        print("\nShutting down system...")
+    finally:
+        pipeline.stop()
+        camera.stop()
+        presentation.terminate()
+        presentation.wait()
+        print("System shutdown complete.")
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,33 @@
 import cv2
 import time
 import os
+import denoise
+import calibrate
+import frame_source
 
 def configure_camera():
     print("Opening camera...")
-    cap = cv2.VideoCapture(0)
+    cap = frame_source.open_source()
     
     if not cap.isOpened():
         print("Failed to open camera")
         return
         
     try:
-        # Initial camera warm-up
-        print("\nInitial camera warm-up...")
-        time.sleep(5)
-        
         # Set resolution first
         print("\nSetting resolution...")
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # C270 will automatically adjust to 1280x720
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
         
-        # Refined settings that worked well
+        # Calibrated settings for this camera, or the ones that worked well
         print("\nConfiguring camera settings...")
-        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)   # Manual exposure mode
-        cap.set(cv2.CAP_PROP_EXPOSURE, 108)         # Our good exposure value
-        cap.set(cv2.CAP_PROP_GAIN, 0)               # Minimum gain
-        cap.set(cv2.CAP_PROP_SHARPNESS, 75)         # Reduced sharpness
-        cap.set(cv2.CAP_PROP_CONTRAST, 40)          # Slight contrast boost
-        
-        # Let settings stabilize
-        print("Letting settings stabilize...")
-        time.sleep(3)
+        settings = (calibrate.load_profile(cap.index) if cap.is_device else None) or calibrate.DEFAULT_SETTINGS
+        calibrate.apply_settings(cap, settings)
         
-        # Discard initial frames
-        print("Discarding initial frames...")
-        for _ in range(10):
-            cap.read()
-            time.sleep(0.2)
+        # Wait for the settings to take instead of sleeping
+        print("Waiting for frames to settle...")
+        stable, elapsed = calibrate.wait_stable(cap, timeout=8.0)
+        print(f"{'Settled' if stable else 'Still settling'} after {elapsed:.1f}s")
         
         # Take test photo
         print("\nTaking test photo...")
@@ -49,8 +40,8 @@ def configure_camera():
             if not os.path.exists('webcam_tests'):
                 os.makedirs('webcam_tests')
                 
-            # Apply our successful denoising
-            denoised = cv2.fastNlMeansDenoisingColored(frame, None, 5, 5, 7, 21)
+            # Apply the configured denoising (DENOISE_MODE, default nlm)
+            denoised = denoise.denoise(frame)
             
             # Save both original and denoised versions
             timestamp = time.strftime("%H%M%S")
@@ -60,10 +51,10 @@ def configure_camera():
             print(f"\nSaved images with resolution {width}x{height}")
             print("\nCurrent settings:")
             print(f"- Resolution: {width}x{height}")
-            print("- Exposure: 108")
-            print("- Gain: 0")
-            print("- Sharpness: 75")
-            print("- Contrast: 40")
+            print(f"- Camera: {calibrate.device_key(cap.index) if cap.is_device else type(cap).__name__}")
+            for name, value in settings.items():
+                print(f"- {name.replace('_', ' ').capitalize()}: {value}")
+            print(f"- Denoise mode: {denoise.DENOISE_MODE}")
             
             # Print available resolutions
             print("\nChecking available resolutions...")
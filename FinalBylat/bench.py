@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import cv2
+from denoise_bench import synthetic_reference, add_noise
+from mock_api import start_mock_server
+import tracing
+
+# Each configuration runs in its own process (settings are read from the
+# environment at import time) against a fresh mock server in this one, so
+# the worker's CPU and memory numbers are its own.
+CONFIGS = {
+    'pipeline': {'mode': 'pipeline', 'env': {}},
+    'pipeline-stream': {'mode': 'pipeline', 'env': {'API_STREAM': '1'}},
+    'pipeline-jpeg': {'mode': 'pipeline', 'env': {'PAYLOAD_FORMAT': 'jpeg'}},
+    'pipeline-fast-denoise': {'mode': 'pipeline', 'env': {'DENOISE_MODE': 'downscale'}},
+    'drain': {'mode': 'drain', 'env': {}},
+}
+DEFAULT_CONFIGS = ('pipeline', 'drain')
+
+# Every worker gets these; the cache would turn repeated frames into hits,
+# and the per-stage breakdown comes from the trace file
+BASE_ENV = {
+    'ANTHROPIC_API_KEY': 'mock',
+    'CACHE_ENABLED': '0',
+    'TRACE_ENABLED': '1',
+}
+
+RESULTS_DIR = 'bench_results'
+
+def synthetic_frame(index, width=1280, height=720, sigma=8):
+    """A noisy page of text, numbered so no two frames are the same."""
+    frame = synthetic_reference(width, height)
+    cv2.rectangle(frame, (0, height - 50), (width, height), (255, 255, 255), -1)
+    cv2.putText(frame, f"Benchmark frame #{index:05d}", (30, height - 15),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2, cv2.LINE_AA)
+    return add_noise(frame, sigma, seed=index)
+
+def load_frames(count, source=None):
+    """Recorded frames from a directory (cycled), or synthetic ones."""
+    if not source:
+        return [synthetic_frame(i) for i in range(count)]
+    names = sorted(n for n in os.listdir(source) if n.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if not names:
+        raise ValueError(f"No images in {source}")
+    images = [cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR) for name in names]
+    return [images[i % len(images)] for i in range(count)]
+
+class SyntheticCamera:
+    """Stands in for CameraDaemon, handing out the prepared frames in order."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def capture(self):
+        with self.lock:
+            frame = self.frames[self.index % len(self.frames)].copy()
+            self.index += 1
+        return frame, {"latency_ms": 0.0, "fused": False, "frames": 1, "method": None,
+                       "burst_ms": 0.0, "fuse_ms": 0.0}
+
+def percentiles(values):
+    values = sorted(values)
+    return {f"p{int(q * 100)}": tracing.percentile(values, q) for q in tracing.QUANTILES}
+
+def usage():
+    r = resource.getrusage(resource.RUSAGE_SELF)
+    return r.ru_utime + r.ru_stime, r.ru_maxrss / 1024
+
+def run_pipeline(frames, rate):
+    from ClaudeCamd import PhotoProcessor
+    from pipeline import build_pipeline
+
+    processor = PhotoProcessor()
+    pipeline = build_pipeline(SyntheticCamera(frames), processor)
+    pipeline.start()
+
+    start = time.perf_counter()
+    jobs = []
+    for i in range(len(frames)):
+        if rate:
+            time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        jobs.append(pipeline.submit())
+    for job in jobs:
+        job.done.wait()
+    elapsed = time.perf_counter() - start
+
+    pipeline.stop()
+    processor.shutdown()
+    done = [job for job in jobs if job.error is None and job.text is not None]
+    return {
+        "elapsed_s": elapsed,
+        "completed": len(done),
+        "errors": sum(1 for job in jobs if job.error is not None),
+        "dropped": sum(1 for job in jobs if job.error is None and job.text is None),
+        "latency_ms": percentiles([(job.finished - job.created) * 1000 for job in done]),
+    }
+
+def run_drain(frames, rate):
+    import CamBro
+    from ClaudeCamd import PhotoProcessor
+
+    # Save through CamBro (crop, denoise, atomic write) like a real shot
+    start = time.perf_counter()
+    for frame in frames:
+        CamBro.save_photo(frame)
+    save_s = time.perf_counter() - start
+
+    processor = PhotoProcessor()
+    start = time.perf_counter()
+    processor.drain()
+    elapsed = time.perf_counter() - start
+    processor.shutdown()
+
+    rows = [processor.store.get(i) for i in range(1, processor.store.max_id() + 1)]
+    rows = [row for row in rows if row]
+    remaining = len(processor.list_backlog())
+    return {
+        "elapsed_s": elapsed,
+        "save_s": save_s,
+        "completed": sum(1 for row in rows if row["status"] == "complete"),
+        "errors": remaining,
+        "dropped": 0,
+        "latency_ms": percentiles([row["request_ms"] for row in rows if row["request_ms"] is not None]),
+    }
+
+MODES = {
+    'pipeline': run_pipeline,
+    'drain': run_drain,
+}
+
+def worker(args):
+    """Runs inside the per-configuration process, in a scratch directory."""
+    frames = load_frames(args.frames, args.source)
+    cpu_start, _ = usage()
+    result = MODES[CONFIGS[args.config]['mode']](frames, args.rate)
+    cpu_end, peak_mb = usage()
+
+    result.update(
+        frames=len(frames),
+        throughput=result["completed"] / result["elapsed_s"] if result["elapsed_s"] else 0.0,
+        cpu_s=cpu_end - cpu_start,
+        cpu_percent=100 * (cpu_end - cpu_start) / result["elapsed_s"] if result["elapsed_s"] else 0.0,
+        peak_rss_mb=peak_mb,
+    )
+    tracing.TRACER.close()
+    if os.path.exists(tracing.TRACE_FILE):
+        result["stages"] = {
+            stage: {"count": count, "p50": p50, "p95": p95, "p99": p99}
+            for stage, count, p50, p95, p99, _ in tracing.summarize(tracing.load_spans(tracing.TRACE_FILE))
+        }
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def run_config(name, args):
+    server = start_mock_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               rate_limit=args.rate_limit, token_delay=args.token_delay)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+            env = dict(os.environ, **BASE_ENV, **CONFIGS[name]['env'], ANTHROPIC_BASE_URL=server.url)
+            result_path = os.path.join(scratch, 'result.json')
+            command = [sys.executable, os.path.abspath(__file__), 'worker', '--config', name,
+                       '--frames', str(args.frames), '--rate', str(args.rate), '--result', result_path]
+            if args.source:
+                command += ['--source', os.path.abspath(args.source)]
+            output = None if args.verbose else subprocess.DEVNULL
+            subprocess.run(command, cwd=scratch, env=env, check=True, stdout=output)
+            with open(result_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+    finally:
+        server.shutdown()
+        server.server_close()
+    result["mock"] = dict(server.stats)
+    return result
+
+def git_revision():
+    # The checkout this file is in, wherever the bench is run from
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True, cwd=repo).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, cwd=repo).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def print_results(results):
+    print(f"{'config':<22} {'done':>6} {'err':>4} {'/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu %':>6} {'rss MB':>7}")
+    for name, r in results.items():
+        latency = r["latency_ms"]
+        print(f"{name:<22} {r['completed']:>3}/{r['frames']:<2} {r['errors']:>4} {r['throughput']:>7.2f} "
+              f"{latency['p50']:>8.0f} {latency['p95']:>8.0f} {latency['p99']:>8.0f} "
+              f"{r['cpu_percent']:>6.0f} {r['peak_rss_mb']:>7.0f}")
+
+def run(args):
+    names = args.configs.split(',') if args.configs else list(DEFAULT_CONFIGS)
+    for name in names:
+        if name not in CONFIGS:
+            raise SystemExit(f"Unknown config {name} (choose from {', '.join(CONFIGS)})")
+
+    report = {
+        "commit": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "options": {k: getattr(args, k) for k in ('frames', 'rate', 'latency', 'jitter', 'error_rate',
+                                                  'rate_limit', 'token_delay', 'source')},
+        "results": {},
+    }
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        report["results"][name] = run_config(name, args)
+
+    print_results(report["results"])
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{report['commit']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {path}")
+
+def compare(args):
+    """Side by side numbers for the configs two result files share."""
+    with open(args.before, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    print(f"{before['commit']} -> {after['commit']}")
+
+    metrics = [
+        ("throughput /s", lambda r: r["throughput"], True),
+        ("p50 ms", lambda r: r["latency_ms"]["p50"], False),
+        ("p95 ms", lambda r: r["latency_ms"]["p95"], False),
+        ("p99 ms", lambda r: r["latency_ms"]["p99"], False),
+        ("cpu s", lambda r: r["cpu_s"], False),
+        ("peak rss MB", lambda r: r["peak_rss_mb"], False),
+    ]
+    for name in before["results"]:
+        if name not in after["results"]:
+            continue
+        print(f"\n{name}")
+        for label, value, higher_is_better in metrics:
+            old, new = value(before["results"][name]), value(after["results"][name])
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change < -args.threshold if higher_is_better else change > args.threshold
+            flag = "  REGRESSION" if worse else ""
+            print(f"  {label:<14} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the capture -> Claude paths against a mock API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run configurations and save results")
+    run_parser.add_argument("--configs", help=f"comma separated, from: {', '.join(CONFIGS)}")
+    run_parser.add_argument("--frames", type=int, default=20)
+    run_parser.add_argument("--rate", type=float, default=0, help="captures per second (0 = all at once)")
+    run_parser.add_argument("--source", help="directory of recorded frames instead of synthetic ones")
+    run_parser.add_argument("--latency", type=float, default=0.5, help="mock response time in seconds")
+    run_parser.add_argument("--jitter", type=float, default=0.1)
+    run_parser.add_argument("--error-rate", type=float, default=0.0)
+    run_parser.add_argument("--rate-limit", type=int, default=0)
+    run_parser.add_argument("--token-delay", type=float, default=0.005)
+    run_parser.add_argument("--out", default=RESULTS_DIR)
+    run_parser.add_argument("--verbose", action="store_true", help="show the workers' output")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=5.0, help="percent change to flag")
+
+    worker_parser = commands.add_parser("worker")
+    worker_parser.add_argument("--config", required=True)
+    worker_parser.add_argument("--frames", type=int, required=True)
+    worker_parser.add_argument("--rate", type=float, default=0)
+    worker_parser.add_argument("--source")
+    worker_parser.add_argument("--result", required=True)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        compare(args)
+    else:
+        worker(args)
+
+if __name__ == "__main__":
+    main()
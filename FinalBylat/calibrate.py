@@ -0,0 +1,185 @@
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+import gate
+
+# Per-device camera settings found by `python calibrate.py`, one JSON file
+# per camera, keyed by USB vendor:product[:serial].
+PROFILE_DIR = os.getenv('CAMERA_PROFILE_DIR', 'camera_profiles')
+
+# What worked for our C270 before calibration existed
+DEFAULT_SETTINGS = {
+    'auto_exposure': 0.25,   # manual exposure mode
+    'exposure': 108,
+    'gain': 0,
+    'sharpness': 75,
+    'contrast': 40,
+}
+
+PROPERTIES = {
+    'auto_exposure': cv2.CAP_PROP_AUTO_EXPOSURE,
+    'exposure': cv2.CAP_PROP_EXPOSURE,
+    'gain': cv2.CAP_PROP_GAIN,
+    'sharpness': cv2.CAP_PROP_SHARPNESS,
+    'contrast': cv2.CAP_PROP_CONTRAST,
+}
+
+# Values tried for each setting, in sweep order
+SWEEP = {
+    'exposure': [39, 78, 108, 156, 234, 312],
+    'contrast': [16, 24, 32, 40, 48, 64],
+    'sharpness': [0, 25, 50, 75, 100, 150],
+}
+
+# Frames count as stable once consecutive small copies differ by less than
+# this mean absolute difference (0-255)
+STABLE_DIFF = float(os.getenv('CAMERA_STABLE_DIFF', '2.0'))
+STABLE_FRAMES = 3
+
+def device_key(device=0):
+    """USB vendor:product[:serial] for /dev/video<device>, or video<device>."""
+    name = f'video{device}' if str(device).isdigit() else os.path.basename(str(device))
+    path = os.path.realpath(f'/sys/class/video4linux/{name}/device')
+    # Walk up from the USB interface to the device that has the ids
+    while path.startswith('/sys/') and path != '/sys':
+        vendor = os.path.join(path, 'idVendor')
+        if os.path.exists(vendor):
+            parts = []
+            for name in ('idVendor', 'idProduct', 'serial'):
+                try:
+                    with open(os.path.join(path, name), 'r') as f:
+                        parts.append(f.read().strip())
+                except OSError:
+                    pass
+            return ':'.join(part for part in parts if part)
+        path = os.path.dirname(path)
+    return name
+
+def profile_path(key):
+    return os.path.join(PROFILE_DIR, key.replace(':', '_') + '.json')
+
+def load_profile(device=0):
+    """Saved settings for this camera, or None if it was never calibrated."""
+    return load_profile_for(device_key(device))
+
+def load_profile_for(key):
+    try:
+        with open(profile_path(key), 'r', encoding='utf-8') as f:
+            return json.load(f)['settings']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_profile(key, settings, score):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = profile_path(key)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'device': key, 'settings': settings, 'score': score,
+                   'calibrated_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+    return path
+
+def apply_settings(cap, settings):
+    for name, value in settings.items():
+        if name in PROPERTIES:
+            cap.set(PROPERTIES[name], value)
+
+def small_gray(frame, width=160):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    scale = width / gray.shape[1]
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+def wait_stable(cap, timeout=5.0, threshold=STABLE_DIFF, needed=STABLE_FRAMES):
+    """Read frames until STABLE_FRAMES in a row barely change (exposure and
+    white balance have settled). Returns (stable, elapsed seconds)."""
+    start = time.monotonic()
+    previous = None
+    calm = 0
+    while time.monotonic() - start < timeout:
+        ret, frame = cap.read()
+        if not ret:
+            time.sleep(0.05)
+            continue
+        current = small_gray(frame)
+        # A camera still warming up can return identical black frames
+        if previous is not None and current.mean() > 8:
+            calm = calm + 1 if np.abs(current - previous).mean() < threshold else 0
+            if calm >= needed:
+                return True, time.monotonic() - start
+        previous = current
+    return False, time.monotonic() - start
+
+def score_frame(frame):
+    """Higher is better: sharp edges and good contrast without clipping."""
+    gray = gate.analysis_gray(frame)
+    clipped = float(np.mean((gray <= 2) | (gray >= 253)))
+    return float(np.log1p(gate.sharpness(gray)) * gray.std() * max(0.0, 1.0 - 4 * clipped))
+
+def measure(cap, settings, frames=3):
+    """Apply settings, wait for them to take, and score a few frames."""
+    apply_settings(cap, settings)
+    wait_stable(cap, timeout=3.0)
+    scores = []
+    for _ in range(frames):
+        ret, frame = cap.read()
+        if ret:
+            scores.append(score_frame(frame))
+    return float(np.median(scores)) if scores else 0.0
+
+def calibrate(cap, start=None, frames=3, log=print):
+    """Sweep each setting in turn, keeping the best value before moving on
+    to the next. Returns (settings, score)."""
+    best = dict(start or DEFAULT_SETTINGS)
+    best_score = measure(cap, best, frames)
+    log(f"Starting score {best_score:.1f} with {best}")
+
+    for name, values in SWEEP.items():
+        for value in values:
+            if value == best.get(name):
+                continue
+            candidate = dict(best, **{name: value})
+            score = measure(cap, candidate, frames)
+            log(f"  {name}={value}: {score:.1f}")
+            if score > best_score:
+                best, best_score = candidate, score
+        log(f"Best {name}: {best[name]} (score {best_score:.1f})")
+
+    apply_settings(cap, best)
+    return best, best_score
+
+def list_profiles():
+    for path in sorted(glob.glob(os.path.join(PROFILE_DIR, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        print(f"{profile['device']:<30} {profile['calibrated_at']}  score {profile['score']:.1f}  {profile['settings']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and save the best camera settings for text")
+    parser.add_argument("--device", type=int, default=0)
+    parser.add_argument("--source", help="frame source spec instead, e.g. ring to calibrate through frame_ring.py")
+    parser.add_argument("--frames", type=int, default=3, help="frames scored per setting")
+    parser.add_argument("--list", action="store_true", help="show saved profiles")
+    args = parser.parse_args()
+
+    if args.list:
+        list_profiles()
+        return
+
+    import CamBro
+    cap = CamBro.open_camera(args.source or args.device)
+    if cap is None:
+        return
+    # Through the frame ring the grabber applies the settings for us
+    key = getattr(cap, 'device_key', None) or device_key(args.device)
+    print(f"Calibrating {key} - point the camera at a typical screen")
+    try:
+        settings, score = calibrate(cap, load_profile_for(key), args.frames)
+        path = save_profile(key, settings, score)
+        print(f"\nSaved {settings} (score {score:.1f}) to {path}")
+    finally:
+        cap.release()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+from collections import deque
+import CamBro
+import denoise
+import gate
+
+# Local socket other scripts use to ask for a shot
+SOCKET_PATH = os.getenv('CAMERA_SOCKET', '/tmp/cambro.sock')
+
+class CameraDaemon:
+    """Keeps the camera open and warm so a shot can be taken on request."""
+
+    def __init__(self, device=None, burst_frames=None, burst_method=None):
+        self.device = device
+        self.cap = None
+        self.thread = None
+        self.running = False
+
+        # Burst settings (BURST_FRAMES=1 means single shots)
+        self.burst_frames = max(burst_frames or denoise.BURST_FRAMES, 1)
+        self.burst_method = burst_method or denoise.BURST_METHOD
+
+        # Latest frames read by the grab loop, guarded by the condition
+        self.frame = None
+        self.frame_time = 0.0
+        self.frame_count = 0
+        self.recent = deque(maxlen=self.burst_frames)
+        self.new_frame = threading.Condition()
+
+    def start(self):
+        """Open and configure the camera once, then keep reading frames."""
+        # The grab loop reads into a ring of reused buffers: enough for the
+        # burst window, the current frame and the one being read
+        self.cap = CamBro.open_camera(self.device, buffers=self.burst_frames + 2)
+        if self.cap is None:
+            raise RuntimeError("Failed to open camera")
+
+        self.running = True
+        self.thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self.thread.start()
+        print("Camera daemon ready")
+
+    def _grab_loop(self):
+        # Reading continuously keeps exposure settled and the driver buffer fresh
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.05)
+                continue
+            with self.new_frame:
+                self.frame = frame
+                self.frame_time = time.monotonic()
+                self.frame_count += 1
+                self.recent.append(frame)
+                self.new_frame.notify_all()
+
+    def take_shot(self, timeout=2.0):
+        """Return (frame, latency_ms) for the first frame read after the request."""
+        pressed = time.monotonic()
+        with self.new_frame:
+            if not self.new_frame.wait_for(lambda: self.frame_time > pressed, timeout):
+                return None, None
+            # Copy while the grab loop can't reuse the buffer
+            frame = self.frame.copy()
+            latency_ms = (self.frame_time - pressed) * 1000
+        return frame, latency_ms
+
+    def next_frame(self, after_count, transform, timeout=2.0):
+        """Return (frame_count, transform(frame)) for the first frame after
+        after_count, or (after_count, None) on timeout. transform runs under
+        the lock, so it should be quick (e.g. a small grayscale copy)."""
+        with self.new_frame:
+            if not self.new_frame.wait_for(lambda: self.frame_count > after_count, timeout):
+                return after_count, None
+            return self.frame_count, transform(self.frame)
+
+    def take_burst(self, timeout=None):
+        """Return (frames, latency_ms, burst_ms) for the next burst_frames frames."""
+        count = self.burst_frames
+        timeout = timeout or 2.0 + count * 0.2
+        pressed = time.monotonic()
+        with self.new_frame:
+            start_count = self.frame_count
+            if not self.new_frame.wait_for(lambda: self.frame_count >= start_count + count, timeout):
+                return None, None, None
+            frames = [frame.copy() for frame in list(self.recent)[-count:]]
+            burst_ms = (self.frame_time - pressed) * 1000
+
+        # Latency to the first frame of the burst, assuming a steady frame rate
+        latency_ms = burst_ms / count
+        return frames, latency_ms, burst_ms
+
+    def capture(self):
+        """Take a single shot or a fused burst, depending on burst_frames.
+
+        Returns (frame, stats) where stats holds latency and timing in ms and
+        whether the frame was fused (fused frames skip single frame denoise).
+        """
+        if self.burst_frames == 1:
+            frame, latency_ms = self.take_shot()
+            return frame, {"latency_ms": latency_ms, "fused": False}
+
+        frames, latency_ms, burst_ms = self.take_burst()
+        if frames is None:
+            return None, {"latency_ms": None, "fused": False}
+
+        start = time.perf_counter()
+        frame = denoise.fuse_frames(frames, self.burst_method)
+        fuse_ms = (time.perf_counter() - start) * 1000
+        return frame, {
+            "latency_ms": latency_ms,
+            "fused": True,
+            "frames": len(frames),
+            "method": self.burst_method,
+            "burst_ms": burst_ms,
+            "fuse_ms": fuse_ms,
+        }
+
+    def shoot(self):
+        """Take a shot and save it the same way CamBro.capture_photo does."""
+        frame, stats = self.capture()
+        if frame is None:
+            print("Failed to capture photo")
+            return None, None
+
+        if gate.GATE_ENABLED:
+            frame, _ = gate.gate(frame, retake=lambda: self.capture()[0])
+            if frame is None:
+                print(gate.STATS.summary())
+                return None, stats['latency_ms']
+
+        print(f"\nPress-to-frame latency: {stats['latency_ms']:.1f} ms")
+        if stats["fused"]:
+            print(f"Burst of {stats['frames']} frames in {stats['burst_ms']:.1f} ms, "
+                  f"{stats['method']} fusion in {stats['fuse_ms']:.1f} ms")
+            return CamBro.save_photo(frame, denoise_mode='off'), stats['latency_ms']
+        return CamBro.save_photo(frame), stats['latency_ms']
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        if self.cap:
+            self.cap.release()
+            print("\nCamera released")
+
+class ShotHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        command = self.rfile.readline().decode('utf-8').strip()
+        if command != 'shot':
+            reply = {"error": f"unknown command: {command}"}
+        else:
+            path, latency_ms = self.server.camera.shoot()
+            reply = {"path": path, "latency_ms": latency_ms}
+        self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+
+def request_shot(socket_path=SOCKET_PATH, timeout=10):
+    """Ask a running camera daemon for a shot over its local socket."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(b"shot\n")
+        reply = sock.makefile('r', encoding='utf-8').readline()
+    return json.loads(reply)
+
+def main():
+    camera = CameraDaemon()
+    camera.start()
+
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+
+    server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, ShotHandler)
+    server.camera = camera
+
+    print(f"Listening for shot requests on {SOCKET_PATH}")
+    print("Press Ctrl+C to stop")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping camera daemon...")
+    finally:
+        server.server_close()
+        os.remove(SOCKET_PATH)
+        camera.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import cv2
+import numpy as np
+
+# Mode used when the caller doesn't pick one
+DENOISE_MODE = os.getenv('DENOISE_MODE', 'nlm')
+
+def denoise_nlm(frame):
+    """Our original full colour non-local means."""
+    return cv2.fastNlMeansDenoisingColored(frame, None, 5, 5, 7, 21)
+
+def denoise_nlm_luma(frame):
+    """Non-local means on the luminance channel only; text lives in luma."""
+    ycrcb = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)
+    y, cr, cb = cv2.split(ycrcb)
+    y = cv2.fastNlMeansDenoising(y, None, 5, 7, 21)
+    return cv2.cvtColor(cv2.merge((y, cr, cb)), cv2.COLOR_YCrCb2BGR)
+
+def denoise_bilateral(frame):
+    """Edge preserving bilateral filter, much cheaper than NLM."""
+    return cv2.bilateralFilter(frame, 7, 50, 50)
+
+def denoise_downscale(frame, scale=0.5):
+    """Run NLM at reduced resolution and scale the result back up."""
+    height, width = frame.shape[:2]
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    small = cv2.fastNlMeansDenoisingColored(small, None, 5, 5, 7, 21)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+def denoise_off(frame):
+    return frame
+
+DENOISERS = {
+    'nlm': denoise_nlm,
+    'nlm_luma': denoise_nlm_luma,
+    'bilateral': denoise_bilateral,
+    'downscale': denoise_downscale,
+    'off': denoise_off,
+}
+
+def denoise(frame, mode=None):
+    """Denoise a frame with the named mode (defaults to DENOISE_MODE)."""
+    mode = mode or DENOISE_MODE
+    if mode not in DENOISERS:
+        raise ValueError(f"Unknown denoise mode: {mode} (choose from {', '.join(DENOISERS)})")
+    return DENOISERS[mode](frame)
+
+# Burst capture: how many frames to keep and how to fuse them
+BURST_FRAMES = int(os.getenv('BURST_FRAMES', '1'))
+BURST_METHOD = os.getenv('BURST_METHOD', 'median')
+
+def fuse_nlm_multi(frames):
+    """Temporal NLM around the middle frame of the burst."""
+    middle = len(frames) // 2
+    # Window must be odd and fit around the middle frame
+    window = 2 * min(middle, len(frames) - 1 - middle) + 1
+    return cv2.fastNlMeansDenoisingColoredMulti(frames, middle, window, None, 5, 5, 7, 21)
+
+def fuse_median(frames):
+    """Per pixel median across the burst; drops flicker and outliers."""
+    return np.median(np.stack(frames), axis=0).astype(np.uint8)
+
+def fuse_mean(frames):
+    """Per pixel mean across the burst; cheapest fusion."""
+    return np.mean(np.stack(frames), axis=0, dtype=np.float32).round().astype(np.uint8)
+
+FUSERS = {
+    'nlm_multi': fuse_nlm_multi,
+    'median': fuse_median,
+    'mean': fuse_mean,
+}
+
+def fuse_frames(frames, method=None):
+    """Fuse a burst of frames into one cleaner frame (defaults to BURST_METHOD)."""
+    method = method or BURST_METHOD
+    if method not in FUSERS:
+        raise ValueError(f"Unknown burst method: {method} (choose from {', '.join(FUSERS)})")
+    if len(frames) == 1:
+        return frames[0]
+    return FUSERS[method](list(frames))
@@ -0,0 +1,123 @@
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from denoise import DENOISERS, FUSERS
+
+def synthetic_reference(width=1280, height=720):
+    """Render a clean page of text to use as the reference image."""
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    lines = [
+        "The quick brown fox jumps over the lazy dog 0123456789",
+        "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+        "ERROR 0x1F3A: connection reset by peer (retry 3/5)",
+        "Total: $1,284.07   Tax: $102.73   Due: 2024-11-02",
+    ]
+    y = 60
+    while y < height - 20:
+        for line in lines:
+            if y >= height - 20:
+                break
+            cv2.putText(image, line, (30, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2, cv2.LINE_AA)
+            y += 45
+    return image
+
+def add_noise(image, sigma, seed=0):
+    """Add Gaussian sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, sigma, image.shape)
+    return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+def psnr(reference, image):
+    return cv2.PSNR(reference, image)
+
+def ssim(reference, image):
+    """Mean SSIM on the grayscale images, where OCR does its work."""
+    a = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    b = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    mu_a = cv2.GaussianBlur(a, (11, 11), 1.5)
+    mu_b = cv2.GaussianBlur(b, (11, 11), 1.5)
+    sigma_a = cv2.GaussianBlur(a * a, (11, 11), 1.5) - mu_a ** 2
+    sigma_b = cv2.GaussianBlur(b * b, (11, 11), 1.5) - mu_b ** 2
+    sigma_ab = cv2.GaussianBlur(a * b, (11, 11), 1.5) - mu_a * mu_b
+
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * sigma_ab + c2)) / (
+        (mu_a ** 2 + mu_b ** 2 + c1) * (sigma_a + sigma_b + c2)
+    )
+    return float(ssim_map.mean())
+
+def run_benchmark(reference, noisy, modes, repeat=3):
+    results = []
+    for mode in modes:
+        denoiser = DENOISERS[mode]
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = denoiser(noisy)
+            times.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "mode": mode,
+            "ms": float(np.median(times)),
+            "psnr": psnr(reference, output),
+            "ssim": ssim(reference, output),
+        })
+    return results
+
+def run_burst_benchmark(reference, burst, methods, repeat=3):
+    results = []
+    for method in methods:
+        fuser = FUSERS[method]
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = fuser(burst)
+            times.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "mode": f"burst:{method}",
+            "ms": float(np.median(times)),
+            "psnr": psnr(reference, output),
+            "ssim": ssim(reference, output),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare denoise modes for speed and quality")
+    parser.add_argument("--reference", help="clean reference image (default: rendered text)")
+    parser.add_argument("--noisy", help="noisy capture of the reference (default: reference + noise)")
+    parser.add_argument("--sigma", type=float, default=12.0, help="noise level added when --noisy is not given")
+    parser.add_argument("--modes", nargs="+", default=list(DENOISERS), choices=list(DENOISERS))
+    parser.add_argument("--burst", type=int, default=0,
+                        help="also benchmark burst fusion over this many noisy frames")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    reference = cv2.imread(args.reference) if args.reference else synthetic_reference()
+    if reference is None:
+        parser.error(f"Could not read {args.reference}")
+    noisy = cv2.imread(args.noisy) if args.noisy else add_noise(reference, args.sigma)
+    if noisy is None:
+        parser.error(f"Could not read {args.noisy}")
+
+    height, width = noisy.shape[:2]
+    print(f"Benchmarking {len(args.modes)} modes on {width}x{height}, {args.repeat} runs each\n")
+    results = run_benchmark(reference, noisy, args.modes, args.repeat)
+    if args.burst > 1:
+        burst = [add_noise(reference, args.sigma, seed) for seed in range(args.burst)]
+        results += run_burst_benchmark(reference, burst, list(FUSERS), args.repeat)
+
+    print(f"{'mode':<18}{'ms':>10}{'PSNR dB':>10}{'SSIM':>8}")
+    for result in results:
+        print(f"{result['mode']:<18}{result['ms']:>10.1f}{result['psnr']:>10.2f}{result['ssim']:>8.4f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.json}")
+
+if __name__ == "__main__":
+    main()
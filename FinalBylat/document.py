@@ -0,0 +1,99 @@
+import os
+import time
+import cv2
+import numpy as np
+
+# Find the screen/page in the frame, straighten it and crop to its text.
+# A quad must cover at least DOC_MIN_AREA of the frame to be used.
+DOC_ENABLED = os.getenv('DOC_ENABLED', '1') == '1'
+DOC_MIN_AREA = float(os.getenv('DOC_MIN_AREA', '0.15'))
+DOC_TEXT_CROP = os.getenv('DOC_TEXT_CROP', '1') == '1'
+DOC_MARGIN = int(os.getenv('DOC_MARGIN', '12'))
+DETECT_WIDTH = 640
+
+def order_corners(points):
+    """Corners as top-left, top-right, bottom-right, bottom-left."""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)],
+    ], dtype=np.float32)
+
+def find_quad(frame, min_area=DOC_MIN_AREA):
+    """Largest convex four-sided contour, in full frame coordinates, or None."""
+    scale = min(1.0, DETECT_WIDTH / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(gray, 50, 150)
+    edges = cv2.dilate(edges, None, iterations=1)
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    frame_area = gray.shape[0] * gray.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:10]:
+        area = cv2.contourArea(contour)
+        if area < min_area * frame_area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return order_corners(approx) / scale
+    return None
+
+def warp_quad(frame, corners):
+    """Perspective-warp the quad to an upright rectangle of its own size."""
+    tl, tr, br, bl = corners
+    width = int(max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl)))
+    height = int(max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl)))
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(frame, matrix, (width, height))
+
+def text_bounds(frame, margin=DOC_MARGIN):
+    """Bounding box (x, y, w, h) around everything that looks like text, or None."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    # Text is high local contrast; a morphological gradient finds it on light
+    # and dark backgrounds alike
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    lines = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [cv2.boundingRect(c) for c in contours]
+    boxes = [(x, y, w, h) for x, y, w, h in boxes if 5 <= h <= frame.shape[0] // 4 and w >= h]
+    if not boxes:
+        return None
+
+    x0 = max(0, min(x for x, _, _, _ in boxes) - margin)
+    y0 = max(0, min(y for _, y, _, _ in boxes) - margin)
+    x1 = min(frame.shape[1], max(x + w for x, _, w, _ in boxes) + margin)
+    y1 = min(frame.shape[0], max(y + h for _, y, _, h in boxes) + margin)
+    return x0, y0, x1 - x0, y1 - y0
+
+def extract_document(frame, text_crop=DOC_TEXT_CROP):
+    """Straighten and crop the dominant screen/page.
+
+    Returns (image, info). Falls back to the full frame when no quad is
+    found, and to the whole quad when no text box is found inside it.
+    """
+    start = time.perf_counter()
+    info = {"quad": False, "text_crop": False}
+
+    corners = find_quad(frame)
+    if corners is not None:
+        frame = warp_quad(frame, corners)
+        info["quad"] = True
+
+    if text_crop:
+        bounds = text_bounds(frame)
+        if bounds is not None:
+            x, y, w, h = bounds
+            frame = np.ascontiguousarray(frame[y:y + h, x:x + w])
+            info["text_crop"] = True
+
+    info["size"] = (frame.shape[1], frame.shape[0])
+    info["ms"] = (time.perf_counter() - start) * 1000
+    return frame, info
@@ -0,0 +1,366 @@
+import argparse
+import fcntl
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+import frame_source
+
+# One grabber process owns the camera and publishes every frame into a
+# shared memory ring; preview, capture and calibration attach with
+# FRAME_SOURCE=ring and read the newest frame in place.
+FRAME_RING_NAME = os.getenv('FRAME_RING_NAME', 'cambro_frames')
+FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', '8'))
+
+MAGIC = 0x43414D52494E47   # "CAMRING"
+MAX_READERS = 8
+
+# The slots have a fixed size, so readers may not change the frame geometry
+GEOMETRY_PROPERTIES = (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)
+
+# Shared memory layout (all int64 unless noted):
+#   0    header[16]
+#   128  control value (float64)
+#   136  device key (64 bytes, utf-8)
+#   256  readers[MAX_READERS, 4]: pid, frames read, dropped, last seq
+#   512  slot meta[slots, 2]: seq (-1 while being written), time_ns
+#   then frames[slots, height, width, channels] (uint8), 64 byte aligned
+HEADER_FIELDS = 16
+MAGIC_FIELD, SLOTS, HEIGHT, WIDTH, CHANNELS, LATEST, WRITER_PID, CTRL_SEQ, CTRL_PROP, CTRL_DONE, STARTED_NS = range(11)
+CONTROL_OFFSET = 128
+KEY_OFFSET = 136
+KEY_BYTES = 64
+READERS_OFFSET = 256
+META_OFFSET = 512
+
+def frames_offset(slots):
+    end = META_OFFSET + slots * 16
+    return (end + 63) // 64 * 64
+
+def attach_memory(name):
+    """Attach without registering with the resource tracker, which would
+    otherwise unlink the grabber's memory when this reader exits."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    except Exception:
+        pass
+    return memory
+
+class FrameRing:
+    """Numpy views over the shared memory block."""
+
+    def __init__(self, memory):
+        self.memory = memory
+        buf = memory.buf
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buf)
+        self.control_value = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=CONTROL_OFFSET)
+        self.readers = np.ndarray((MAX_READERS, 4), dtype=np.int64, buffer=buf, offset=READERS_OFFSET)
+
+    def map_frames(self):
+        slots = int(self.header[SLOTS])
+        # CHANNELS is 0 for single channel (2D) frames
+        shape = (slots, int(self.header[HEIGHT]), int(self.header[WIDTH]))
+        if self.header[CHANNELS]:
+            shape += (int(self.header[CHANNELS]),)
+        self.slots = slots
+        self.meta = np.ndarray((slots, 2), dtype=np.int64, buffer=self.memory.buf, offset=META_OFFSET)
+        self.frames = np.ndarray(shape, dtype=np.uint8, buffer=self.memory.buf, offset=frames_offset(slots))
+
+    @property
+    def shape(self):
+        return self.frames.shape[1:]
+
+    @property
+    def device_key(self):
+        raw = bytes(self.memory.buf[KEY_OFFSET:KEY_OFFSET + KEY_BYTES])
+        return raw.rstrip(b'\0').decode('utf-8', 'replace')
+
+    def latest(self):
+        return int(self.header[LATEST])
+
+    def release_views(self):
+        # Views must go before the memory can be closed
+        self.header = self.control_value = self.readers = self.meta = self.frames = None
+
+class FrameRingWriter(FrameRing):
+    """The grabber's side: writes frames into slots in turn."""
+
+    def __init__(self, shape, slots=FRAME_RING_SLOTS, name=FRAME_RING_NAME, device_key=''):
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 0
+        size = frames_offset(slots) + slots * height * width * max(channels, 1)
+        try:
+            memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a grabber that died; we own the camera now
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        super().__init__(memory)
+        self.header[:] = 0
+        self.readers[:] = 0
+        self.header[SLOTS] = slots
+        self.header[HEIGHT] = height
+        self.header[WIDTH] = width
+        self.header[CHANNELS] = channels
+        self.header[WRITER_PID] = os.getpid()
+        self.header[STARTED_NS] = time.time_ns()
+        key = device_key.encode('utf-8')[:KEY_BYTES]
+        memory.buf[KEY_OFFSET:KEY_OFFSET + KEY_BYTES] = key.ljust(KEY_BYTES, b'\0')
+        self.map_frames()
+        self.meta[:] = -1
+        self.header[MAGIC_FIELD] = MAGIC
+
+    def begin(self):
+        """Next (seq, slot buffer) to write into; readers skip it until commit."""
+        seq = self.latest() + 1
+        index = seq % self.slots
+        self.meta[index, 0] = -1
+        return seq, self.frames[index]
+
+    def commit(self, seq):
+        index = seq % self.slots
+        self.meta[index, 1] = time.time_ns()
+        self.meta[index, 0] = seq
+        self.header[LATEST] = seq
+
+    def pending_control(self):
+        """(prop, value) a reader asked to set on the camera, or None."""
+        if self.header[CTRL_SEQ] == self.header[CTRL_DONE]:
+            return None
+        return int(self.header[CTRL_PROP]), float(self.control_value[0])
+
+    def control_done(self):
+        self.header[CTRL_DONE] = self.header[CTRL_SEQ]
+
+    def close(self):
+        self.header[WRITER_PID] = 0
+        self.release_views()
+        self.memory.close()
+        self.memory.unlink()
+
+class FrameRingReader(FrameRing):
+    """A client's side: the newest frame as a read-only view, no copy.
+
+    A view stays valid until the grabber comes back round to its slot
+    (FRAME_RING_SLOTS frames later); check valid(seq) after using it, or
+    copy it to keep it.
+    """
+
+    def __init__(self, name=FRAME_RING_NAME):
+        super().__init__(attach_memory(name))
+        if self.header[MAGIC_FIELD] != MAGIC:
+            raise RuntimeError(f"Shared memory {name} is not a frame ring")
+        self.map_frames()
+        self.frames.flags.writeable = False
+        self.last_seq = 0
+        self.frames_read = 0
+        self.dropped = 0
+        self.overwritten = 0
+        self.reader_slot = self.register()
+
+    def register(self):
+        """Claim a row in the readers table so `status` can show our counters."""
+        for slot in range(MAX_READERS):
+            pid = int(self.readers[slot, 0])
+            if pid == 0 or not pid_alive(pid):
+                self.readers[slot] = (os.getpid(), 0, 0, 0)
+                return slot
+        return None
+
+    def read(self, timeout=2.0):
+        """Wait for a frame newer than the last one read; returns (seq, view)
+        or (None, None) on timeout. Frames skipped in between count as dropped."""
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.latest()
+            if seq > self.last_seq:
+                index = seq % self.slots
+                if self.meta[index, 0] == seq:
+                    break
+            if time.monotonic() > deadline:
+                return None, None
+            time.sleep(0.001)
+
+        if self.last_seq:
+            self.dropped += seq - self.last_seq - 1
+        self.last_seq = seq
+        self.frames_read += 1
+        if self.reader_slot is not None:
+            self.readers[self.reader_slot, 1:] = (self.frames_read, self.dropped, seq)
+        return seq, self.frames[index]
+
+    def valid(self, seq):
+        """False once the grabber has started overwriting that frame."""
+        ok = self.meta[seq % self.slots, 0] == seq
+        if not ok:
+            self.overwritten += 1
+        return bool(ok)
+
+    def frame_age_ms(self, seq):
+        return (time.time_ns() - int(self.meta[seq % self.slots, 1])) / 1e6
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "dropped": self.dropped,
+            "overwritten": self.overwritten,
+            "lag": self.latest() - self.last_seq,
+        }
+
+    def close(self):
+        if self.reader_slot is not None:
+            self.readers[self.reader_slot] = 0
+        self.release_views()
+        try:
+            self.memory.close()
+        except BufferError:
+            pass   # a caller still holds a frame view; the OS unmaps it at exit
+
+def control_lock_path(name):
+    return os.path.join(tempfile.gettempdir(), f"{name}.control.lock")
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+class RingSource(frame_source.FrameSource):
+    """FrameSource over the ring, so any consumer can use FRAME_SOURCE=ring."""
+
+    def __init__(self, name=FRAME_RING_NAME):
+        super().__init__(buffers=1)
+        self.name = name
+        self.reader = FrameRingReader(name)
+        self.size = (self.reader.shape[1], self.reader.shape[0])
+        self.device_key = self.reader.device_key
+
+    def read(self, image=None):
+        """(ok, frame) without copying unless image is given. The frame is a
+        read-only view of a slot every reader shares: don't modify it, copy
+        it first (or pass image) to draw on it."""
+        seq, frame = self.reader.read()
+        if frame is None:
+            return False, None
+        return self.deliver(frame, image)
+
+    def set(self, prop, value, timeout=1.0):
+        """Ask the grabber to set a camera property and wait for it to.
+        Frame size can't be changed through the ring."""
+        if prop in GEOMETRY_PROPERTIES:
+            return False
+        header = self.reader.header
+        deadline = time.monotonic() + timeout
+        # One request in the mailbox at a time, across all reader processes
+        with open(control_lock_path(self.name), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            while header[CTRL_DONE] < header[CTRL_SEQ]:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.005)
+            seq = int(header[CTRL_SEQ]) + 1
+            header[CTRL_PROP] = prop
+            self.reader.control_value[0] = value
+            header[CTRL_SEQ] = seq
+            while header[CTRL_DONE] < seq:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.005)
+        return True
+
+    def release(self):
+        self.reader.close()
+
+def serve(source=None, slots=FRAME_RING_SLOTS, name=FRAME_RING_NAME):
+    """Grabber loop: own the camera and decode straight into the ring."""
+    import CamBro
+    import calibrate
+
+    cap = CamBro.open_camera(source, buffers=1)
+    if cap is None:
+        return
+    ret, frame = cap.read()
+    if not ret:
+        print("Failed to read from camera")
+        cap.release()
+        return
+
+    key = calibrate.device_key(cap.index) if cap.is_device else type(cap).__name__
+    writer = FrameRingWriter(frame.shape, slots, name, key)
+    height, width = frame.shape[:2]
+    print(f"Publishing {width}x{height} frames from {key} to shared memory '{name}' ({slots} slots)")
+    print("Attach with FRAME_SOURCE=ring; Ctrl+C to stop")
+
+    try:
+        while True:
+            control = writer.pending_control()
+            if control is not None:
+                if control[0] not in GEOMETRY_PROPERTIES:
+                    cap.set(*control)
+                writer.control_done()
+
+            seq, slot = writer.begin()
+            ok, _ = cap.read(slot)
+            if ok:
+                writer.commit(seq)
+            else:
+                time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        cap.release()
+        print("\nFrame ring stopped")
+
+def status(name=FRAME_RING_NAME):
+    reader = FrameRing(attach_memory(name))
+    try:
+        if reader.header[MAGIC_FIELD] != MAGIC:
+            print(f"{name} is not a frame ring")
+            return
+        reader.map_frames()
+        latest = reader.latest()
+        uptime = (time.time_ns() - int(reader.header[STARTED_NS])) / 1e9
+        height, width = reader.shape[:2]
+        print(f"{name}: {reader.device_key} {width}x{height}, writer pid {int(reader.header[WRITER_PID])}")
+        print(f"  {latest} frames in {uptime:.0f}s ({latest / uptime if uptime else 0:.1f} fps), {reader.slots} slots")
+        for pid, frames_read, dropped, last_seq in reader.readers:
+            if pid and pid_alive(int(pid)):
+                print(f"  reader pid {pid}: {frames_read} read, {dropped} dropped, lag {latest - last_seq} frames")
+    finally:
+        reader.release_views()
+        reader.memory.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared memory frame ring")
+    parser.add_argument("--name", default=FRAME_RING_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="own the camera and publish frames")
+    serve_parser.add_argument("--source", help="frame source spec (default FRAME_SOURCE)")
+    serve_parser.add_argument("--slots", type=int, default=FRAME_RING_SLOTS)
+    commands.add_parser("status", help="writer rate and reader counters")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.source, args.slots, args.name)
+    else:
+        try:
+            status(args.name)
+        except FileNotFoundError:
+            print(f"No frame ring named {args.name} (start one with: python frame_ring.py serve)")
+
+if __name__ == "__main__":
+    main()
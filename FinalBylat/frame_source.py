@@ -0,0 +1,245 @@
+import os
+import time
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+from denoise_bench import synthetic_reference
+
+# Where frames come from: a device index ("0"), a video file, a folder of
+# images replayed at a fixed rate ("frames/@5" for 5 fps), "synthetic" or
+# "ring" (the shared memory ring published by frame_ring.py).
+FRAME_SOURCE = os.getenv('FRAME_SOURCE', '0')
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+class FrameRing:
+    """A few preallocated frame buffers handed out in turn.
+
+    A frame from read() stays valid until `count` more frames have been
+    read; copy it to keep it longer.
+    """
+
+    def __init__(self, count=2):
+        self.buffers = [None] * max(count, 1)
+        self.index = 0
+
+    def next(self, shape=None, dtype=np.uint8):
+        """The next buffer, (re)allocated only when the shape changes."""
+        self.index = (self.index + 1) % len(self.buffers)
+        buffer = self.buffers[self.index]
+        if shape is not None and (buffer is None or buffer.shape != shape or buffer.dtype != dtype):
+            buffer = self.buffers[self.index] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def store(self, frame):
+        """Remember a buffer allocated elsewhere (e.g. by the decoder)."""
+        self.buffers[self.index] = frame
+        return frame
+
+class FrameSource(ABC):
+    """Reads frames like cv2.VideoCapture: read() -> (ok, frame).
+
+    Frames live in the source's FrameRing and are reused, so consumers that
+    hold on to a frame past `buffers` reads must copy it.
+    """
+
+    is_device = False
+
+    def __init__(self, buffers=2, fps=0):
+        self.ring = FrameRing(buffers)
+        self.fps = fps
+        self.next_time = None
+        self.size = (0, 0)
+
+    def pace(self):
+        """Hand out frames no faster than fps, like a camera would."""
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self.next_time is None or now > self.next_time + 1.0:
+            self.next_time = now
+        elif now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time += 1.0 / self.fps
+
+    def isOpened(self):
+        return True
+
+    @abstractmethod
+    def read(self, image=None):
+        """(ok, frame); like VideoCapture.read, a given image is filled in place."""
+
+    def deliver(self, frame, image=None):
+        if image is None or frame is image:
+            return True, frame
+        if frame.shape != image.shape:
+            return False, None
+        np.copyto(image, frame)
+        return True, image
+
+    def set(self, prop, value):
+        # Camera controls don't apply to recorded or generated frames
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1])
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def release(self):
+        pass
+
+class DeviceSource(FrameSource):
+    """A V4L2 (or any OpenCV) camera, decoded straight into ring buffers."""
+
+    is_device = True
+
+    def __init__(self, index=0, buffers=2):
+        super().__init__(buffers)
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        buffer = self.ring.next() if image is None else image
+        ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+        if not ret:
+            return False, None
+        if image is not None:
+            return self.deliver(frame, image)
+        # OpenCV allocates when the buffer doesn't fit; keep that one instead
+        if frame is not buffer:
+            self.ring.store(frame)
+        return True, frame
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+class VideoFileSource(FrameSource):
+    """A recorded session, played at its own frame rate and looped."""
+
+    def __init__(self, path, buffers=2, loop=True, realtime=True):
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(buffers, fps=self.cap.get(cv2.CAP_PROP_FPS) if realtime else 0)
+        self.path = path
+        self.loop = loop
+        self.size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        self.pace()
+        buffer = self.ring.next() if image is None else image
+        ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+        if not ret:
+            return False, None
+        if image is not None:
+            return self.deliver(frame, image)
+        if frame is not buffer:
+            self.ring.store(frame)
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+class ImageFolderSource(FrameSource):
+    """Images from a directory in name order, replayed at fps and looped."""
+
+    def __init__(self, path, fps=10, buffers=2, loop=True):
+        super().__init__(buffers, fps)
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.loop = loop
+        self.position = 0
+        if self.paths:
+            first = cv2.imread(self.paths[0], cv2.IMREAD_COLOR)
+            if first is not None:
+                self.size = (first.shape[1], first.shape[0])
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self, image=None):
+        if self.position >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False, None
+            self.position = 0
+        self.pace()
+        frame = cv2.imread(self.paths[self.position], cv2.IMREAD_COLOR)
+        self.position += 1
+        if frame is None:
+            return False, None
+        # Replays look like a camera: one frame size throughout
+        if self.size == (0, 0):
+            self.size = frame.shape[1::-1]
+        elif frame.shape[1::-1] != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if image is not None:
+            return self.deliver(frame, image)
+        return True, self.ring.store(frame)
+
+class SyntheticSource(FrameSource):
+    """A rendered page of text with a changing frame counter; no hardware."""
+
+    def __init__(self, width=1280, height=720, fps=30, buffers=2):
+        super().__init__(buffers, fps)
+        self.size = (width, height)
+        self.count = 0
+        self.page = synthetic_reference(width, height)
+        # Room for the frame counter along the bottom
+        self.page[height - 55:] = 255
+
+    def read(self, image=None):
+        self.pace()
+        self.count += 1
+        frame = self.ring.next(self.page.shape) if image is None else image
+        if frame.shape != self.page.shape:
+            return False, None
+        np.copyto(frame, self.page)
+        cv2.putText(frame, f"Synthetic frame #{self.count:06d}", (30, self.size[1] - 25),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2, cv2.LINE_AA)
+        return True, frame
+
+def open_source(spec=None, buffers=2):
+    """Open a FrameSource from a spec (see FRAME_SOURCE) or device index."""
+    spec = FRAME_SOURCE if spec is None else spec
+    if isinstance(spec, int) or str(spec).isdigit():
+        return DeviceSource(int(spec), buffers)
+
+    spec = str(spec)
+    if spec == 'ring' or spec.startswith('ring:'):
+        # Frames published by `python frame_ring.py serve`
+        import frame_ring
+        _, _, name = spec.partition(':')
+        return frame_ring.RingSource(name or frame_ring.FRAME_RING_NAME)
+    if spec.startswith('synthetic'):
+        _, _, fps = spec.partition('@')
+        return SyntheticSource(fps=float(fps or 30), buffers=buffers)
+
+    path, _, fps = spec.partition('@')
+    if path.startswith('/dev/'):
+        return DeviceSource(path, buffers)
+    if os.path.isdir(path):
+        return ImageFolderSource(path, fps=float(fps or 10), buffers=buffers)
+    if path.lower().endswith(VIDEO_EXTENSIONS):
+        return VideoFileSource(path, buffers)
+    raise ValueError(f"Unknown frame source: {spec}")
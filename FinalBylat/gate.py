@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+# Local checks run before any API call. Sharpness is the variance of the
+# Laplacian and text is the fraction of the frame covered by text-like
+# regions, both measured on a GATE_WIDTH wide grayscale copy.
+GATE_ENABLED = os.getenv('GATE_ENABLED', '1') == '1'
+GATE_MIN_SHARPNESS = float(os.getenv('GATE_MIN_SHARPNESS', '60'))
+GATE_MIN_TEXT = float(os.getenv('GATE_MIN_TEXT', '0.01'))
+GATE_METHOD = os.getenv('GATE_METHOD', 'edges')   # edges or mser
+GATE_RETRIES = int(os.getenv('GATE_RETRIES', '2'))
+GATE_WIDTH = 640
+
+def analysis_gray(frame, width=GATE_WIDTH):
+    """Small grayscale copy; the checks don't need full resolution."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    if gray.shape[1] > width:
+        scale = width / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+def sharpness(gray):
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def text_boxes_edges(gray):
+    """Text lines: edges smeared horizontally into wide, short blobs."""
+    edges = cv2.Canny(gray, 50, 150)
+    lines = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if 5 <= h <= 60 and w >= 2 * h:
+            boxes.append((x, y, w, h))
+    return boxes
+
+def text_boxes_mser(gray):
+    """Text characters: stable regions of character-like size and shape."""
+    _, boxes = cv2.MSER_create().detectRegions(gray)
+    return [
+        (int(x), int(y), int(w), int(h)) for x, y, w, h in boxes
+        if 5 <= h <= 60 and 0.1 <= w / h <= 2.0
+    ]
+
+TEXT_DETECTORS = {
+    'edges': text_boxes_edges,
+    'mser': text_boxes_mser,
+}
+
+def text_score(gray, method=GATE_METHOD):
+    """Fraction of the frame covered by text-like boxes."""
+    mask = np.zeros(gray.shape, dtype=np.uint8)
+    for x, y, w, h in TEXT_DETECTORS[method](gray):
+        mask[y:y + h, x:x + w] = 1
+    return float(mask.mean())
+
+def check_frame(frame, min_sharpness=GATE_MIN_SHARPNESS, min_text=GATE_MIN_TEXT, method=GATE_METHOD):
+    """Score a frame; returns a dict with passed, reason, scores and ms."""
+    start = time.perf_counter()
+    gray = analysis_gray(frame)
+    result = {"sharpness": sharpness(gray), "text": None, "passed": False, "reason": None}
+
+    # Blur is the cheaper check, so skip text detection on blurry frames
+    if result["sharpness"] < min_sharpness:
+        result["reason"] = f"blurry (sharpness {result['sharpness']:.0f} < {min_sharpness:.0f})"
+    else:
+        result["text"] = text_score(gray, method)
+        if result["text"] < min_text:
+            result["reason"] = f"no text found (coverage {result['text']:.3f} < {min_text:.3f})"
+        else:
+            result["passed"] = True
+
+    result["ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+class GateStats:
+    """Counters for how the gate has treated frames so far."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.passed = 0
+        self.retaken = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    def record(self, result):
+        with self.lock:
+            self.checked += 1
+            self.total_ms += result["ms"]
+            if result["passed"]:
+                self.passed += 1
+
+    def summary(self):
+        with self.lock:
+            average = self.total_ms / self.checked if self.checked else 0.0
+            return (f"gate: {self.checked} checked, {self.passed} passed, {self.retaken} retaken, "
+                    f"{self.rejected} rejected, {average:.1f} ms/check")
+
+STATS = GateStats()
+
+def gate(frame, retake=None, retries=GATE_RETRIES, stats=STATS, log=print):
+    """Check a frame, retaking it up to `retries` times with retake().
+
+    Returns (frame, result); frame is None when every attempt failed.
+    """
+    result = check_frame(frame)
+    stats.record(result)
+    attempt = 0
+    while not result["passed"] and retake is not None and attempt < retries:
+        attempt += 1
+        with stats.lock:
+            stats.retaken += 1
+        log(f"Frame {result['reason']}, retaking ({attempt}/{retries})")
+        frame = retake()
+        if frame is None:
+            break
+        result = check_frame(frame)
+        stats.record(result)
+
+    if not result["passed"]:
+        with stats.lock:
+            stats.rejected += 1
+        log(f"Frame rejected: {result['reason']}")
+        return None, result
+    return frame, result
@@ -0,0 +1,184 @@
+import csv
+import io
+import os
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+import payload
+import tiling
+
+# Optional local first pass with Tesseract (the `tesseract` binary, no
+# Python bindings needed). Confident results are used as they are; low
+# confidence lines are re-read by Claude, or the whole image when too much
+# of it is uncertain.
+LOCAL_OCR = os.getenv('LOCAL_OCR', '0') == '1'
+LOCAL_OCR_MIN_CONF = float(os.getenv('LOCAL_OCR_MIN_CONF', '85'))   # 0-100, per line
+LOCAL_OCR_MAX_LOW = float(os.getenv('LOCAL_OCR_MAX_LOW', '0.3'))    # low lines before sending it all
+LOCAL_OCR_MAX_REGIONS = int(os.getenv('LOCAL_OCR_MAX_REGIONS', '4'))
+LOCAL_OCR_LANG = os.getenv('LOCAL_OCR_LANG', 'eng')
+TESSERACT_CMD = os.getenv('TESSERACT_CMD', 'tesseract')
+REGION_PADDING = 6
+
+REGION_PROMPT = (
+    "This image is a strip cut from a picture of a screen. "
+    "Respond with exactly the text visible in it, line by line, and nothing else."
+)
+
+class Line:
+    def __init__(self, words):
+        self.text = " ".join(word["text"] for word in words)
+        # Longer words count for more, so a stray low confidence "|" doesn't sink a line
+        weights = [len(word["text"]) for word in words]
+        self.confidence = sum(w * word["conf"] for w, word in zip(weights, words)) / sum(weights)
+        self.left = min(word["left"] for word in words)
+        self.top = min(word["top"] for word in words)
+        self.right = max(word["left"] + word["width"] for word in words)
+        self.bottom = max(word["top"] + word["height"] for word in words)
+
+def run_tesseract(image_bytes, lang=LOCAL_OCR_LANG):
+    """Tesseract's TSV output for an encoded image fed on stdin."""
+    result = subprocess.run(
+        [TESSERACT_CMD, "stdin", "stdout", "-l", lang, "--psm", "6", "tsv"],
+        input=image_bytes, capture_output=True, check=True, timeout=30,
+    )
+    return result.stdout.decode("utf-8", "replace")
+
+def parse_lines(tsv):
+    """Recognised lines in reading order from Tesseract TSV."""
+    lines = {}
+    for row in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        text = (row.get("text") or "").strip()
+        if row.get("level") != "5" or not text or float(row["conf"]) < 0:
+            continue
+        key = (int(row["block_num"]), int(row["par_num"]), int(row["line_num"]))
+        lines.setdefault(key, []).append({
+            "text": text, "conf": float(row["conf"]),
+            "left": int(row["left"]), "top": int(row["top"]),
+            "width": int(row["width"]), "height": int(row["height"]),
+        })
+    return [Line(words) for _, words in sorted(lines.items())]
+
+def low_spans(lines, min_conf):
+    """Runs of consecutive low confidence lines, as lists of line indexes."""
+    spans = []
+    for index, line in enumerate(lines):
+        if line.confidence >= min_conf:
+            continue
+        if spans and spans[-1][-1] == index - 1:
+            spans[-1].append(index)
+        else:
+            spans.append([index])
+    return spans
+
+class RouterStats:
+    """How images have been routed so far, for tuning LOCAL_OCR_MIN_CONF."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"local": 0, "regions": 0, "remote": 0}
+        self.local_ms = 0.0
+        self.remote_ms = 0.0
+
+    def record(self, route, local_ms, remote_ms):
+        with self.lock:
+            self.counts[route] += 1
+            self.local_ms += local_ms
+            self.remote_ms += remote_ms
+
+    def summary(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            escalated = self.counts["regions"] + self.counts["remote"]
+            rate = escalated / total if total else 0.0
+            local = self.local_ms / total if total else 0.0
+            remote = self.remote_ms / escalated if escalated else 0.0
+            return (f"local OCR: {self.counts['local']} local, {self.counts['regions']} regions escalated, "
+                    f"{self.counts['remote']} fully escalated ({rate:.0%} escalation), "
+                    f"{local:.0f} ms local / {remote:.0f} ms remote on average")
+
+class LocalRouter:
+    """Tesseract first; Claude only for what Tesseract isn't sure about."""
+
+    def __init__(self, min_conf=LOCAL_OCR_MIN_CONF, max_low=LOCAL_OCR_MAX_LOW,
+                 max_regions=LOCAL_OCR_MAX_REGIONS, log=print):
+        self.min_conf = min_conf
+        self.max_low = max_low
+        self.max_regions = max_regions
+        self.log = log
+        self.available = True
+        self.stats = RouterStats()
+
+    def recognize(self, image_bytes):
+        """Lines from Tesseract, or None if it can't be run."""
+        if not self.available:
+            return None
+        try:
+            return parse_lines(run_tesseract(image_bytes))
+        except FileNotFoundError:
+            self.available = False
+            self.log(f"{TESSERACT_CMD} not found, sending everything to the API")
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            self.log(f"Tesseract failed ({e}), sending this image to the API")
+        return None
+
+    def route(self, image_bytes, remote_full, remote_region):
+        """Returns (text, route). remote_full() transcribes the whole image,
+        remote_region(bytes, media_type) one cropped region."""
+        start = time.perf_counter()
+        lines = self.recognize(image_bytes)
+        local_ms = (time.perf_counter() - start) * 1000
+
+        spans = low_spans(lines, self.min_conf) if lines else []
+        low = sum(len(span) for span in spans)
+        if lines and not spans:
+            route = "local"
+        elif lines and low <= self.max_low * len(lines) and len(spans) <= self.max_regions:
+            route = "regions"
+        else:
+            route = "remote"
+
+        start = time.perf_counter()
+        if route == "local":
+            text = "\n".join(line.text for line in lines)
+        elif route == "regions":
+            text = self.escalate_regions(image_bytes, lines, spans, remote_region)
+        else:
+            text = remote_full()
+        remote_ms = (time.perf_counter() - start) * 1000
+
+        self.stats.record(route, local_ms, remote_ms)
+        confidence = min((line.confidence for line in lines), default=0.0)
+        self.log(f"Routed {route}: {len(lines or [])} lines, {low} below {self.min_conf:g} "
+                 f"(lowest {confidence:.0f}), local {local_ms:.0f} ms, remote {remote_ms:.0f} ms")
+        return text, route
+
+    def escalate_regions(self, image_bytes, lines, spans, remote_region):
+        """Re-read each run of doubtful lines with Claude and splice the
+        answers in place of Tesseract's text."""
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        height, width = image.shape[:2]
+        pool = tiling.executor()
+        futures = []
+        for span in spans:
+            top = max(0, min(lines[i].top for i in span) - REGION_PADDING)
+            bottom = min(height, max(lines[i].bottom for i in span) + REGION_PADDING)
+            # Full width strips, a line's boxes can miss text Tesseract skipped
+            crop = np.ascontiguousarray(image[top:bottom, 0:width])
+            data, media_type = payload.prepare_frame(crop)
+            futures.append(pool.submit(remote_region, data, media_type))
+
+        replaced = {}
+        for span, future in zip(spans, futures):
+            replaced[span[0]] = future.result().strip()
+            for index in span[1:]:
+                replaced[index] = None
+
+        output = []
+        for index, line in enumerate(lines):
+            if index not in replaced:
+                output.append(line.text)
+            elif replaced[index]:
+                output.append(replaced[index])
+        return "\n".join(output)
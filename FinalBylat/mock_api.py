@@ -0,0 +1,289 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockMessagesHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/messages like the Anthropic Messages API."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, error_type, message, headers=None):
+        self.send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        server = self.server
+        body = self.read_body()
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/batches":
+            self.send_json(200, server.create_batch(body))
+            return
+        if path != "/v1/messages":
+            self.send_error_json(404, "not_found_error", f"Unknown path {self.path}")
+            return
+
+        server.count("requests")
+
+        # Rate limit before doing any "work", like the real API
+        if not server.allow_request():
+            server.count("rate_limited")
+            self.send_error_json(429, "rate_limit_error", "Mock rate limit exceeded", {"retry-after": "1"})
+            return
+
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        if random.random() < server.error_rate:
+            server.count("errors")
+            self.send_error_json(529, "overloaded_error", "Mock server overloaded")
+            return
+
+        message = server.make_message(body)
+        if body.get("stream"):
+            self.send_stream(message)
+        else:
+            self.send_json(200, message)
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        # v1/messages/batches/<id>[/results]
+        if len(parts) < 4 or parts[:3] != ["v1", "messages", "batches"]:
+            self.send_error_json(404, "not_found_error", f"Unknown path {self.path}")
+            return
+
+        batch = self.server.get_batch(parts[3])
+        if batch is None:
+            self.send_error_json(404, "not_found_error", f"Unknown batch {parts[3]}")
+        elif len(parts) == 5 and parts[4] == "results":
+            self.send_results(batch)
+        else:
+            self.send_json(200, self.server.batch_status(batch))
+
+    def send_results(self, batch):
+        lines = [json.dumps(result) for result in self.server.batch_results(batch)]
+        data = ("\n".join(lines) + "\n").encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def send_stream(self, message):
+        """Server-sent events in the shape the SDK's message stream expects."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        text = message["content"][0]["text"]
+        start = dict(message, content=[], stop_reason=None,
+                     usage={"input_tokens": message["usage"]["input_tokens"], "output_tokens": 0})
+        self.send_event("message_start", {"type": "message_start", "message": start})
+        self.send_event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+        })
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == 0 else " " + word
+            self.send_event("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk},
+            })
+            time.sleep(self.server.token_delay)
+        self.send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self.send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]},
+        })
+        self.send_event("message_stop", {"type": "message_stop"})
+
+class MockMessagesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.0, error_rate=0.0, rate_limit=0,
+                 text=None, token_delay=0.02, verbose=False):
+        super().__init__(address, MockMessagesHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.text = text
+        self.token_delay = token_delay
+        self.verbose = verbose
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self.window = []
+        self.batches = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def allow_request(self):
+        """Sliding one second window of at most rate_limit requests."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            if len(self.window) >= self.rate_limit:
+                return False
+            self.window.append(now)
+            return True
+
+    def make_message(self, body):
+        number = next(self.ids)
+        images = 0
+        image_bytes = 0
+        for message in body.get("messages", []):
+            content = message.get("content", [])
+            if isinstance(content, str):
+                continue
+            for block in content:
+                if block.get("type") == "image":
+                    images += 1
+                    image_bytes += len(block.get("source", {}).get("data", ""))
+
+        text = self.text or f"Mock transcription #{number} ({images} image(s), {image_bytes} base64 bytes)"
+        return {
+            "id": f"msg_mock_{number:06d}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1 + image_bytes // 1000, "output_tokens": len(text.split())},
+        }
+
+    def create_batch(self, body):
+        """Message Batches: everything in a batch ends `latency` seconds after creation."""
+        with self.lock:
+            batch_id = f"msgbatch_mock_{len(self.batches) + 1:06d}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "created": time.time(),
+                "requests": body.get("requests", []),
+                "results": None,
+            }
+            batch = self.batches[batch_id]
+        return self.batch_status(batch)
+
+    def get_batch(self, batch_id):
+        with self.lock:
+            return self.batches.get(batch_id)
+
+    def batch_results(self, batch):
+        with self.lock:
+            if batch["results"] is None:
+                results = []
+                for request in batch["requests"]:
+                    if random.random() < self.error_rate:
+                        result = {"type": "errored", "error": {
+                            "type": "error", "error": {"type": "overloaded_error", "message": "Mock error"},
+                        }}
+                    else:
+                        result = {"type": "succeeded", "message": self.make_message(request.get("params", {}))}
+                    results.append({"custom_id": request.get("custom_id"), "result": result})
+                batch["results"] = results
+            return batch["results"]
+
+    def batch_status(self, batch):
+        def iso(timestamp):
+            return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+        total = len(batch["requests"])
+        ended = time.time() - batch["created"] >= self.latency
+        counts = {"processing": total, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if ended:
+            results = self.batch_results(batch)
+            succeeded = sum(1 for r in results if r["result"]["type"] == "succeeded")
+            counts.update(processing=0, succeeded=succeeded, errored=total - succeeded)
+
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": counts,
+            "created_at": iso(batch["created"]),
+            "expires_at": iso(batch["created"] + 86400),
+            "ended_at": iso(batch["created"] + self.latency) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+def start_mock_server(port=0, **options):
+    """Start a mock server on a background thread; returns the server."""
+    server = MockMessagesServer(("127.0.0.1", port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 529")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429 (0 = none)")
+    parser.add_argument("--text", help="fixed response text")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed words")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = MockMessagesServer(
+        ("127.0.0.1", args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        text=args.text,
+        token_delay=args.token_delay,
+        verbose=args.verbose,
+    )
+    print(f"Mock Messages API listening on {server.url}")
+    print(f"Use: ANTHROPIC_BASE_URL={server.url} ANTHROPIC_API_KEY=mock python ClaudeCamd.py")
+    print("Press Ctrl+C to stop")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopping mock server... {server.stats}")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,45 @@
 import subprocess
-import time
 import os
-import glob
 import signal
+import argparse
+import autoscan
+from camera_daemon import CameraDaemon
+from ClaudeCamd import PhotoProcessor
+from pipeline import build_pipeline
 
-def run_system():
+def run_system(auto=False):
+    # Open the camera once and keep it warm between photos
+    print("Starting camera...")
+    camera = CameraDaemon()
+    try:
+        camera.start()
+    except RuntimeError as e:
+        print(e)
+        return
+    
     # Start presentation viewer in background
     print("Starting Presentation viewer...")
     presentation = subprocess.Popen(['python', 'Presentation.py'])
     
-    # Start Claude in background
-    print("Starting Claude processor...")
-    claude = subprocess.Popen(['python', 'ClaudeCamd.py'])
+    # Start the capture -> Claude pipeline in this process
+    print("Starting Claude pipeline...")
+    pipeline = build_pipeline(camera, PhotoProcessor())
+    pipeline.start()
     
     try:
+        if auto:
+            # Capture whenever a new page settles in front of the camera
+            autoscan.run(camera, pipeline)
+            return
+
         while True:
             # Take new photo
             print("\nTaking new photo...")
-            subprocess.run(['python', 'CamBro.py'])
+            job = pipeline.submit()
             
-            # Wait for image to be processed (check for deletion)
-            while glob.glob("ToClaude/*.png"):
-                print("Waiting for Claude to process image...")
-                time.sleep(1)
+            # Wait for image to be processed
+            print("Waiting for Claude to process image...")
+            job.done.wait()
             
             # Wait for user input before next photo
             input("\nPress Enter to take another photo or Ctrl+C to quit...")
@@ -31,9 +48,11 @@ def run_system():
         print("\nShutting down system...")
     finally:
         # Clean up processes
-        print("Stopping Claude processor...")
-        claude.terminate()
-        claude.wait()
+        print("Stopping Claude pipeline...")
+        pipeline.stop()
+        
+        print("Stopping camera...")
+        camera.stop()
         
         print("Stopping Presentation viewer...")
         presentation.terminate()
@@ -42,6 +61,11 @@ def run_system():
         print("System shutdown complete.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture screens and send them to Claude")
+    parser.add_argument("--auto", action="store_true",
+                        help="capture automatically when the scene changes and settles")
+    args = parser.parse_args()
+
     print("Starting camera system...")
     print("Press Ctrl+C at any time to stop all processes and exit.")
-    run_system()
+    run_system(auto=args.auto)
@@ -0,0 +1,91 @@
+import os
+import cv2
+import numpy as np
+
+# Pre-upload settings. Claude downscales anything with a long edge above
+# 1568 px or more than ~1.15 megapixels, so sending more is wasted bytes.
+PAYLOAD_MAX_DIM = int(os.getenv('PAYLOAD_MAX_DIM', '1568'))
+PAYLOAD_MAX_PIXELS = int(os.getenv('PAYLOAD_MAX_PIXELS', '1150000'))
+PAYLOAD_GRAYSCALE = os.getenv('PAYLOAD_GRAYSCALE', '0') == '1'
+# png, jpeg or webp; unset, frames go as PNG and files keep their own format
+PAYLOAD_FORMAT = os.getenv('PAYLOAD_FORMAT', '')
+PAYLOAD_QUALITY = int(os.getenv('PAYLOAD_QUALITY', '85'))
+
+MEDIA_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+FORMATS = {
+    'png': ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 3]),
+    'jpeg': ('.jpg', [cv2.IMWRITE_JPEG_QUALITY]),
+    'webp': ('.webp', [cv2.IMWRITE_WEBP_QUALITY]),
+}
+
+# Format to re-encode a file in when none is asked for (GIFs become PNG)
+FILE_FORMATS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpeg',
+    'image/webp': 'webp',
+}
+
+def media_type_for(path):
+    """Media type from a file's extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported image type: {path}")
+    return MEDIA_TYPES[ext]
+
+def fit_size(width, height, max_dim=PAYLOAD_MAX_DIM, max_pixels=PAYLOAD_MAX_PIXELS):
+    """Largest size within the model's limits that keeps the aspect ratio."""
+    scale = min(1.0, max_dim / max(width, height), (max_pixels / (width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def prepare_frame(frame, max_dim=PAYLOAD_MAX_DIM, grayscale=PAYLOAD_GRAYSCALE,
+                  fmt=PAYLOAD_FORMAT, quality=PAYLOAD_QUALITY):
+    """Resize, optionally grayscale and encode a frame; returns (bytes, media_type)."""
+    fmt = fmt or 'png'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown payload format: {fmt} (choose from {', '.join(FORMATS)})")
+
+    height, width = frame.shape[:2]
+    size = fit_size(width, height, max_dim)
+    if size != (width, height):
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    if grayscale and frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    ext, params = FORMATS[fmt]
+    if fmt != 'png':
+        params = params + [quality]
+    ok, buffer = cv2.imencode(ext, frame, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode image as {fmt}")
+    return buffer.tobytes(), MEDIA_TYPES[ext]
+
+def prepare_file(path, max_dim=PAYLOAD_MAX_DIM, grayscale=PAYLOAD_GRAYSCALE,
+                 fmt=PAYLOAD_FORMAT, quality=PAYLOAD_QUALITY):
+    """Like prepare_frame for an image on disk; sends the file untouched when it
+    already fits and no other format or grayscale is asked for. A file that
+    has to be resized keeps its own format unless fmt says otherwise."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    media_type = media_type_for(path)
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode image: {path}")
+
+    height, width = image.shape[:2]
+    untouched = (
+        fit_size(width, height, max_dim) == (width, height)
+        and not grayscale
+        and (not fmt or media_type == MEDIA_TYPES[FORMATS[fmt][0]])
+    )
+    if untouched:
+        return data, media_type
+    return prepare_frame(image, max_dim, grayscale, fmt or FILE_FORMATS.get(media_type), quality)
@@ -0,0 +1,168 @@
+import os
+import threading
+import zlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Cache settings: distance is in bits out of 64. Off by default: a 64 bit
+# hash can't tell apart screens that differ in a few characters (one changed
+# value on a dashboard is within the threshold), so only turn it on where
+# the same screen really is re-shot unchanged.
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', '0') == '1'
+CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
+CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', '6'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+CACHE_MEMORY_ITEMS = int(os.getenv('CACHE_MEMORY_ITEMS', '256'))
+
+def _gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+def dhash(image):
+    """64 bit difference hash: is each pixel brighter than its right neighbour."""
+    small = cv2.resize(_gray(image), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def phash(image):
+    """64 bit perceptual hash from the low frequencies of a 32x32 DCT."""
+    small = cv2.resize(_gray(image), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # Skip the DC term when picking the median so overall brightness doesn't matter
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def prompt_key(prompt):
+    return zlib.crc32(prompt.encode('utf-8'))
+
+class ResponseCache:
+    """Transcriptions keyed by perceptual hash, on disk with an in-memory LRU.
+
+    A lookup hits when a stored image for the same prompt is within
+    `threshold` bits of the new one. The disk copy is evicted oldest-used
+    first once it grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=CACHE_DIR, threshold=CACHE_THRESHOLD,
+                 max_bytes=CACHE_MAX_BYTES, memory_items=CACHE_MEMORY_ITEMS, hasher=phash):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hasher = hasher
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Index of what's on disk: (image hash, prompt key) -> size in bytes
+        self.index = {}
+        self.total_bytes = 0
+        for name in os.listdir(directory):
+            key = self._parse_name(name)
+            if key:
+                size = os.path.getsize(os.path.join(directory, name))
+                self.index[key] = size
+                self.total_bytes += size
+
+    def _parse_name(self, name):
+        stem, ext = os.path.splitext(name)
+        if ext != '.txt' or '_' not in stem:
+            return None
+        image_hash, prompt_hash = stem.split('_', 1)
+        try:
+            return int(image_hash, 16), int(prompt_hash, 16)
+        except ValueError:
+            return None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[0]:016x}_{key[1]:08x}.txt")
+
+    def hash(self, image):
+        return self.hasher(image)
+
+    def hash_file(self, path):
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Could not decode image: {path}")
+        return self.hasher(image)
+
+    def lookup(self, image_hash, prompt):
+        """Return (text, distance) for the closest stored image, or (None, None)."""
+        prompt_hash = prompt_key(prompt)
+        with self.lock:
+            best, distance = None, self.threshold + 1
+            for key in self.index:
+                if key[1] != prompt_hash:
+                    continue
+                d = hamming(key[0], image_hash)
+                if d < distance:
+                    best, distance = key, d
+                    if d == 0:
+                        break
+
+            if best is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+
+            if best in self.memory:
+                self.memory.move_to_end(best)
+                text = self.memory[best]
+            else:
+                with open(self._path(best), 'r', encoding='utf-8') as f:
+                    text = f.read()
+                self._remember(best, text)
+
+            # Mark as recently used for disk eviction
+            os.utime(self._path(best))
+        return text, distance
+
+    def store(self, image_hash, prompt, text):
+        key = (image_hash, prompt_key(prompt))
+        path = self._path(key)
+        data = text.encode('utf-8')
+
+        with self.lock:
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+            self.total_bytes += len(data) - self.index.get(key, 0)
+            self.index[key] = len(data)
+            self._remember(key, text)
+            self._evict()
+
+    def _remember(self, key, text):
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        by_age = sorted(self.index, key=lambda key: os.path.getmtime(self._path(key)))
+        for key in by_age:
+            if self.total_bytes <= self.max_bytes:
+                break
+            os.remove(self._path(key))
+            self.total_bytes -= self.index.pop(key)
+            self.memory.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.index),
+            "bytes": self.total_bytes,
+        }
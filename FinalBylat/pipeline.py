@@ -0,0 +1,228 @@
+import base64
+import itertools
+import queue
+import threading
+import time
+import CamBro
+import document
+import gate
+import payload
+import tiling
+import tracing
+from ClaudeCamd import STATIC_PROMPT, API_CONCURRENCY, API_STREAM
+
+class Job:
+    """One capture moving through the pipeline as in-memory buffers."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, prompt=STATIC_PROMPT):
+        self.capture_id = f"{CamBro.make_timestamp()}-{next(self._ids)}"
+        self.prompt = prompt
+        self.frame = None
+        self.fused = False
+        self.image_bytes = None
+        self.media_type = None
+        self.tiles = None
+        self.image_hash = None
+        self.text = None
+        self.response_id = None
+        self.error = None
+        self.timings = {}
+        self.metrics = {}
+        self.created = time.perf_counter()
+        self.finished = None
+        self.done = threading.Event()
+
+class Pipeline:
+    """Runs jobs through named stages, each with its own queue and workers.
+
+    A stage function takes a job and returns it, or returns None to drop
+    the job. Exceptions mark the job as failed and skip the remaining stages.
+    """
+
+    def __init__(self, stages, on_error=None):
+        # stages is a list of (name, func, workers)
+        self.stages = stages
+        self.on_error = on_error
+        self.queues = [queue.Queue() for _ in stages]
+        self.threads = [[] for _ in stages]
+
+    def start(self):
+        for index, (name, func, workers) in enumerate(self.stages):
+            for _ in range(workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(index,), name=f"{name}-worker", daemon=True
+                )
+                thread.start()
+                self.threads[index].append(thread)
+
+    def submit(self, job=None):
+        """Queue a job at the first stage without waiting for it."""
+        job = job or Job()
+        self.queues[0].put(job)
+        return job
+
+    def _worker(self, index):
+        name, func, _ = self.stages[index]
+        while True:
+            job = self.queues[index].get()
+            if job is None:
+                break
+
+            wall_start = time.time()
+            start = time.perf_counter()
+            try:
+                result = func(job)
+            except Exception as e:
+                job.error = e
+                result = None
+                if self.on_error:
+                    self.on_error(job, name, e)
+            job.timings[name] = (time.perf_counter() - start) * 1000
+            tracing.record(job.capture_id, name, wall_start, error=str(job.error) if job.error else None)
+
+            if result is None or index == len(self.stages) - 1:
+                job.finished = time.perf_counter()
+                job.done.set()
+            else:
+                self.queues[index + 1].put(result)
+
+    def stop(self):
+        # Drain stage by stage so jobs already queued still reach the end
+        for index, (_, _, workers) in enumerate(self.stages):
+            for _ in range(workers):
+                self.queues[index].put(None)
+            for thread in self.threads[index]:
+                thread.join()
+
+def build_pipeline(camera, processor, backup=True, denoise_mode=None):
+    """Wire the capture -> denoise -> encode -> API -> persist -> display stages."""
+
+    def capture(job):
+        job.frame, stats = camera.capture()
+        if job.frame is None:
+            raise RuntimeError("Failed to capture photo")
+        job.fused = stats["fused"]
+        processor.console.print(f"[cyan]Press-to-frame latency: {stats['latency_ms']:.1f} ms[/cyan]")
+        if job.fused:
+            processor.console.print(
+                f"[cyan]Burst of {stats['frames']} frames in {stats['burst_ms']:.1f} ms, "
+                f"{stats['method']} fusion in {stats['fuse_ms']:.1f} ms[/cyan]"
+            )
+        return job
+
+    def check_gate(job):
+        # Reject blurry or textless frames before spending an API call
+        frame, result = gate.gate(
+            job.frame,
+            retake=lambda: camera.capture()[0],
+            log=lambda message: processor.console.print(f"[yellow]{message}[/yellow]"),
+        )
+        job.metrics.update(sharpness=result["sharpness"], text_coverage=result["text"])
+        if frame is None:
+            processor.console.print(f"[yellow]Capture {job.capture_id} not sent ({gate.STATS.summary()})[/yellow]")
+            return None
+        job.frame = frame
+        return job
+
+    def crop(job):
+        # Straighten the screen/page and crop to its text (full frame if none found)
+        full = job.frame.shape[1], job.frame.shape[0]
+        # A text crop changes size from shot to shot, which defeats region diffing
+        text_crop = document.DOC_TEXT_CROP and processor.screen is None
+        job.frame, info = document.extract_document(job.frame, text_crop)
+        if info["quad"] or info["text_crop"]:
+            processor.console.print(f"[cyan]Cropped {full[0]}x{full[1]} to {info['size'][0]}x{info['size'][1]} "
+                                    f"(quad: {info['quad']}, text crop: {info['text_crop']})[/cyan]")
+        return job
+
+    def denoise(job):
+        # Fused bursts are already clean
+        if not job.fused:
+            job.frame = CamBro.denoise_frame(job.frame, denoise_mode)
+        return job
+
+    def save_backup(job):
+        # The denoised frame at full resolution, not the downscaled upload;
+        # written before the API call so a failed request doesn't lose it
+        # Named after the capture so it matches its spans and response row
+        CamBro.save_backup(job.frame, timestamp=job.capture_id)
+        return job
+
+    def encode(job):
+        # Hash for the response cache, then resize to the model's limits
+        # and encode as PAYLOAD_FORMAT
+        if processor.cache:
+            job.image_hash = processor.cache.hash(job.frame)
+        if processor.screen is None and tiling.TILE_ENABLED and tiling.needs_tiling(job.frame):
+            # Too big to send whole without losing small text
+            job.tiles = tiling.encode_tiles(job.frame)
+        job.image_bytes, job.media_type = payload.prepare_frame(job.frame)
+        # Differential mode compares full frames in the api stage
+        if processor.screen is None:
+            job.frame = None
+        return job
+
+    def api(job):
+        if processor.screen is not None:
+            hash_hex = f"{job.image_hash:016x}" if job.image_hash is not None else None
+            if API_STREAM:
+                job.response_id = processor.begin_response(job.capture_id, hash_hex)
+            job.text = processor.diff_request(job.frame, job.response_id, job.metrics)
+            job.frame = None
+            return job
+
+        image_data = base64.b64encode(job.image_bytes).decode("utf-8")
+        hash_hex = f"{job.image_hash:016x}" if job.image_hash is not None else None
+        if API_STREAM:
+            # Streamed straight into the response store as tokens arrive
+            job.response_id = processor.begin_response(job.capture_id, hash_hex)
+        job.text = processor.cached_request(
+            job.image_hash, image_data, job.media_type, job.prompt, job.response_id, job.metrics, job.tiles
+        )
+        job.tiles = None
+        return job
+
+    def persist(job):
+        hash_hex = f"{job.image_hash:016x}" if job.image_hash is not None else None
+        job.response_id = processor.save_response(
+            job.text, job.response_id, job.capture_id, hash_hex, metrics=job.metrics
+        )
+        job.image_bytes = None
+        return job
+
+    def display(job):
+        processor.display_response(job.text, job.response_id, streamed=API_STREAM)
+        total_ms = (time.perf_counter() - job.created) * 1000
+        stages = ", ".join(f"{name} {ms:.0f}" for name, ms in job.timings.items())
+        processor.console.print(f"[green]Capture {job.capture_id} done in {total_ms:.0f} ms[/green] [dim]({stages} ms)[/dim]")
+        if gate.GATE_ENABLED:
+            processor.console.print(f"[dim]{gate.STATS.summary()}[/dim]")
+        processor.report_routing()
+        return job
+
+    def on_error(job, stage, error):
+        if job.response_id:
+            processor.store.fail(job.response_id, error)
+        processor.console.print(f"[red]Error in {stage} stage: {str(error)}[/red]")
+
+    stages = [("capture", capture, 1)]
+    if gate.GATE_ENABLED:
+        stages.append(("gate", check_gate, 1))
+    if document.DOC_ENABLED:
+        stages.append(("crop", crop, 1))
+    stages += [
+        ("denoise", denoise, 1),
+    ]
+    if backup:
+        stages.append(("backup", save_backup, 1))
+    stages += [
+        ("encode", encode, 1),
+        # Region diffing compares each capture with the one before, so the
+        # jobs have to reach it in capture order: one worker
+        ("api", api, 1 if processor.screen is not None else API_CONCURRENCY),
+        ("persist", persist, 1),
+        ("display", display, 1),
+    ]
+    return Pipeline(stages, on_error=on_error)
@@ -0,0 +1,152 @@
+import os
+import threading
+import cv2
+import numpy as np
+import payload
+import tiling
+
+# Differential OCR for a screen watched over time: the first capture (a
+# keyframe) is cut into horizontal blocks at the gaps between text lines
+# and each block is transcribed; later captures are aligned to the last one
+# and only blocks whose pixels changed are sent again.
+REGION_DIFF = os.getenv('REGION_DIFF', '0') == '1'
+DIFF_BLOCK_HEIGHT = int(os.getenv('DIFF_BLOCK_HEIGHT', '160'))
+DIFF_PIXEL = int(os.getenv('DIFF_PIXEL', '40'))                    # grey level change that counts
+DIFF_MIN_CHANGED = float(os.getenv('DIFF_MIN_CHANGED', '0.002'))   # of a block's pixels
+DIFF_MAX_CHANGED = float(os.getenv('DIFF_MAX_CHANGED', '0.6'))     # of blocks, else a new keyframe
+DIFF_MIN_RESPONSE = float(os.getenv('DIFF_MIN_RESPONSE', '0.2'))   # phase correlation peak
+ALIGN_WIDTH = 640
+
+BLOCK_PROMPT = (
+    "This image is a horizontal strip cut from a picture of a screen. "
+    "Respond with exactly the text visible in it, line by line, keeping the line breaks, "
+    "and nothing else. Respond with nothing if there is no text."
+)
+
+def gray(frame):
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+def text_rows(frame):
+    """Per row: does it contain text-like contrast?"""
+    g = gray(frame)
+    gradient = cv2.morphologyEx(g, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return (mask > 0).mean(axis=1) > 0.002
+
+def split_blocks(frame, max_height=DIFF_BLOCK_HEIGHT):
+    """(y0, y1) blocks covering the whole frame, cut in the middle of gaps
+    between text lines and at most about max_height tall."""
+    height = frame.shape[0]
+    ink = text_rows(frame)
+    # Middle of every run of empty rows is a candidate cut
+    cuts = []
+    y = 0
+    while y < height:
+        if not ink[y]:
+            start = y
+            while y < height and not ink[y]:
+                y += 1
+            cuts.append((start + y) // 2)
+        y += 1
+
+    blocks = []
+    top = 0
+    last_cut = None
+    for cut in cuts + [height]:
+        if cut - top > max_height and last_cut is not None and last_cut > top:
+            blocks.append((top, last_cut))
+            top = last_cut
+        # Solid text with no gap for too long: cut anyway
+        while cut - top > 2 * max_height:
+            blocks.append((top, top + max_height))
+            top += max_height
+        last_cut = cut
+    if top < height:
+        blocks.append((top, height))
+    return blocks
+
+def align(reference, frame):
+    """Shift frame onto reference (camera jitter); returns (aligned, ok)."""
+    scale = min(1.0, ALIGN_WIDTH / frame.shape[1])
+    size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+    a = cv2.resize(gray(reference), size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    b = cv2.resize(gray(frame), size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    window = cv2.createHanningWindow(size, cv2.CV_32F)
+    (dx, dy), response = cv2.phaseCorrelate(a, b, window)
+    if response < DIFF_MIN_RESPONSE:
+        return frame, False
+    matrix = np.float32([[1, 0, -dx / scale], [0, 1, -dy / scale]])
+    aligned = cv2.warpAffine(frame, matrix, (frame.shape[1], frame.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+    return aligned, True
+
+def changed_blocks(reference, frame, blocks, pixel=DIFF_PIXEL, min_changed=DIFF_MIN_CHANGED):
+    diff = cv2.absdiff(gray(reference), gray(frame)) > pixel
+    return [i for i, (y0, y1) in enumerate(blocks) if diff[y0:y1].mean() > min_changed]
+
+class ScreenDiff:
+    """What the watched screen looked like last time and what it said.
+
+    Captures are handled one at a time (the lock), since each one is
+    compared with the capture before it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reference = None
+        self.blocks = []
+        self.texts = []
+
+    def plan(self, frame):
+        """(aligned frame, indexes of blocks to send, keyframe?)"""
+        if self.reference is None:
+            return self.keyframe(frame)
+        if self.reference.shape != frame.shape:
+            # The page/screen warp can come out a few pixels different
+            height, width = self.reference.shape[:2]
+            if abs(frame.shape[0] - height) > 0.03 * height or abs(frame.shape[1] - width) > 0.03 * width:
+                return self.keyframe(frame)
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        aligned, ok = align(self.reference, frame)
+        if not ok:
+            return self.keyframe(frame)
+        changed = changed_blocks(self.reference, aligned, self.blocks)
+        if len(changed) > DIFF_MAX_CHANGED * len(self.blocks):
+            return self.keyframe(frame)
+        return aligned, changed, False
+
+    def keyframe(self, frame):
+        self.blocks = split_blocks(frame)
+        self.texts = [""] * len(self.blocks)
+        return frame, list(range(len(self.blocks))), True
+
+    def text(self):
+        return "\n".join(text for text in self.texts if text.strip())
+
+    def transcribe(self, frame, request, log=print):
+        """Send the changed blocks with request(image_bytes, media_type) at
+        once and return (merged text, stats)."""
+        with self.lock:
+            frame, changed, keyframe = self.plan(frame)
+            crops = [payload.prepare_frame(frame[y0:y1]) for y0, y1 in (self.blocks[i] for i in changed)]
+            pool = tiling.executor()
+            futures = [pool.submit(request, data, media_type) for data, media_type in crops]
+            try:
+                for index, future in zip(changed, futures):
+                    self.texts[index] = future.result().strip()
+            except Exception:
+                # Some blocks are now out of date; start over with a keyframe
+                self.reference = None
+                raise
+            self.reference = frame
+
+            stats = {"blocks": len(self.blocks), "changed": len(changed), "keyframe": keyframe,
+                     "bytes": sum(len(data) for data, _ in crops)}
+            kind = "keyframe" if keyframe else "diff"
+            log(f"Region {kind}: {len(changed)}/{len(self.blocks)} blocks sent ({stats['bytes'] / 1024:.0f} KB)")
+            return self.text(), stats
+
+def read_image(path):
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode image: {path}")
+    return image
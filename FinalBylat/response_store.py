@@ -0,0 +1,229 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Where responses are kept
+RESPONSE_DB = os.getenv('RESPONSE_DB', 'responses.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    capture_id TEXT,
+    image_hash TEXT,
+    source TEXT,
+    text TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'complete',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    completed_at REAL,
+    request_ms REAL,
+    ttft_ms REAL,
+    bytes_sent INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS responses_image_hash ON responses(image_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+    text, content='responses', content_rowid='id'
+);
+"""
+
+METRIC_COLUMNS = ('request_ms', 'ttft_ms', 'bytes_sent', 'input_tokens', 'output_tokens')
+
+class ResponseStore:
+    """Responses in SQLite with an FTS5 index over the text.
+
+    Streaming responses are created with status 'streaming', grown with
+    append() and indexed once finish() marks them complete. The database
+    runs in WAL mode so the viewer can read while the processor writes.
+    """
+
+    def __init__(self, path=RESPONSE_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def create(self, capture_id=None, image_hash=None, source=None, text='', status='streaming'):
+        """Insert a new response and return its id."""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO responses (capture_id, image_hash, source, text, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (capture_id, image_hash, source, text, status, now, now),
+            )
+            return cursor.lastrowid
+
+    def append(self, response_id, chunk):
+        """Grow a streaming response."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE responses SET text = text || ?, updated_at = ? WHERE id = ?",
+                (chunk, time.time(), response_id),
+            )
+
+    def finish(self, response_id, text=None, metrics=None):
+        """Mark a response complete, record its metrics and index its text."""
+        metrics = metrics or {}
+        now = time.time()
+        columns = [c for c in METRIC_COLUMNS if metrics.get(c) is not None]
+        assignments = "".join(f", {c} = ?" for c in columns)
+        values = [metrics[c] for c in columns]
+
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                if text is not None:
+                    self.conn.execute("UPDATE responses SET text = ? WHERE id = ?", (text, response_id))
+                self.conn.execute(
+                    f"UPDATE responses SET status = 'complete', updated_at = ?, completed_at = ?{assignments} "
+                    "WHERE id = ?",
+                    [now, now] + values + [response_id],
+                )
+                self.conn.execute(
+                    "INSERT INTO responses_fts (rowid, text) SELECT id, text FROM responses WHERE id = ?",
+                    (response_id,),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def fail(self, response_id, error):
+        """Mark a streaming response whose request failed part way."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE responses SET status = 'failed', text = text || ?, updated_at = ? "
+                "WHERE id = ? AND status = 'streaming'",
+                (f"\n\n[Error: {error}]", time.time(), response_id),
+            )
+
+    def add(self, text, capture_id=None, image_hash=None, source=None, metrics=None):
+        """Store a complete response in one go and return its id."""
+        response_id = self.create(capture_id, image_hash, source, text)
+        self.finish(response_id, metrics=metrics)
+        return response_id
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def get(self, response_id):
+        rows = self._query("SELECT * FROM responses WHERE id = ?", (response_id,))
+        return rows[0] if rows else None
+
+    def count(self):
+        return self._query("SELECT COUNT(*) AS n FROM responses")[0]['n']
+
+    def max_id(self):
+        return self._query("SELECT COALESCE(MAX(id), 0) AS id FROM responses")[0]['id']
+
+    def page(self, offset, limit):
+        """Summaries of responses in id order, for list views."""
+        return self._query(
+            "SELECT id, capture_id, created_at, status, substr(text, 1, 80) AS preview "
+            "FROM responses ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+
+    def since(self, last_id):
+        """Summaries of responses added after last_id."""
+        return self._query(
+            "SELECT id, capture_id, created_at, status, substr(text, 1, 80) AS preview "
+            "FROM responses WHERE id > ? ORDER BY id",
+            (last_id,),
+        )
+
+    def summaries(self, ids):
+        """Summaries of the given responses, for refreshing list entries."""
+        if not ids:
+            return []
+        marks = ", ".join("?" * len(ids))
+        return self._query(
+            "SELECT id, capture_id, created_at, status, substr(text, 1, 80) AS preview "
+            f"FROM responses WHERE id IN ({marks})",
+            list(ids),
+        )
+
+    def search(self, query, limit=200):
+        """Full text search over all complete responses, best matches first."""
+        sql = (
+            "SELECT r.id, r.capture_id, r.created_at, r.status, "
+            "snippet(responses_fts, 0, '[', ']', '...', 10) AS preview "
+            "FROM responses_fts JOIN responses r ON r.id = responses_fts.rowid "
+            "WHERE responses_fts MATCH ? ORDER BY rank LIMIT ?"
+        )
+        try:
+            return self._query(sql, (query, limit))
+        except sqlite3.OperationalError:
+            # Not valid FTS syntax (e.g. stray punctuation), search it as a phrase
+            phrase = '"' + query.replace('"', '""') + '"'
+            return self._query(sql, (phrase, limit))
+
+    def export_txt(self, directory='response'):
+        """Write every complete response as response_NNN.txt, the old layout."""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        count = 0
+        with self.lock:
+            rows = self.conn.execute("SELECT id, text FROM responses WHERE status = 'complete' ORDER BY id")
+            for row in rows:
+                with open(os.path.join(directory, f"response_{row['id']:03d}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(row['text'])
+                count += 1
+        return count
+
+    def import_txt(self, directory='response'):
+        """Load an existing response_NNN.txt directory into the store."""
+        def number(name):
+            match = re.search(r'(\d+)', name)
+            return int(match.group(1)) if match else -1
+
+        files = sorted((f for f in os.listdir(directory) if f.endswith('.txt')), key=number)
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, 'r', encoding='utf-8') as f:
+                self.add(f.read(), source=path)
+        return len(files)
+
+    def close(self):
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the response store")
+    parser.add_argument("--db", default=RESPONSE_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write response_NNN.txt files")
+    export.add_argument("--dir", default="response")
+
+    import_ = commands.add_parser("import", help="load response_NNN.txt files")
+    import_.add_argument("--dir", default="response")
+
+    search = commands.add_parser("search", help="full text search")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    store = ResponseStore(args.db)
+
+    if args.command == "export":
+        print(f"Exported {store.export_txt(args.dir)} responses to {args.dir}/")
+    elif args.command == "import":
+        print(f"Imported {store.import_txt(args.dir)} responses from {args.dir}/")
+    elif args.command == "search":
+        for row in store.search(args.query, args.limit):
+            print(f"#{row['id']:<6} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['created_at']))}  "
+                  f"{row['preview']}")
+
+    store.close()
+
+if __name__ == "__main__":
+    main()
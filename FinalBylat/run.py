@@ -0,0 +1,223 @@
+import time
+START = time.perf_counter()
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import threading
+
+# One process for the whole system: the viewer's Tk loop owns the main
+# thread and comes up first, while camera, Claude pipeline and trigger
+# (keyboard, gamepad or auto scan) are imported and started on a
+# background thread. cv2, anthropic, rich and evdev are only imported
+# there, so the window doesn't wait for them.
+#
+#   python run.py                 Enter (terminal) or F5 (viewer) takes a photo
+#   python run.py --gamepad       gamepad button, as MV2.py
+#   python run.py --auto          capture when a new page settles
+#   python run.py importtime      where startup time goes (python -X importtime)
+STATUS_POLL_MS = 200
+
+def elapsed_ms():
+    return (time.perf_counter() - START) * 1000
+
+class Backend:
+    """Camera, pipeline and trigger, started off the main thread."""
+
+    def __init__(self, trigger='keyboard'):
+        self.trigger = trigger
+        self.status = "starting"
+        self.camera = None
+        self.pipeline = None
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+        # stop() and the end of startup agree on who stops the camera
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="backend", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.status = "loading"
+            import_start = time.perf_counter()
+            from camera_daemon import CameraDaemon
+            from ClaudeCamd import PhotoProcessor
+            from pipeline import build_pipeline
+            import_ms = (time.perf_counter() - import_start) * 1000
+
+            self.status = "starting camera"
+            camera = CameraDaemon()
+            camera.start()
+            pipeline = build_pipeline(camera, PhotoProcessor())
+            pipeline.start()
+        except Exception as e:
+            self.status = f"failed: {e}"
+            print(f"Backend failed to start: {e}")
+            return
+
+        with self.lock:
+            if self.stopping.is_set():
+                # Closed while the camera was opening; nobody else will stop it
+                pipeline.stop()
+                camera.stop()
+                return
+            self.camera, self.pipeline = camera, pipeline
+            self.status = "ready"
+            self.ready.set()
+        print(f"Camera and pipeline ready {elapsed_ms():.0f} ms after launch ({import_ms:.0f} ms of imports)")
+
+        if self.trigger == 'auto':
+            import autoscan
+            autoscan.run(self.camera, self.pipeline, stop=self.stopping)
+        elif self.trigger == 'gamepad':
+            self.watch_gamepad()
+        else:
+            self.watch_keyboard()
+
+    def capture(self):
+        """Queue a photo; ignored until the camera is up."""
+        if not self.ready.is_set() or self.stopping.is_set():
+            print(f"Not ready yet ({self.status})")
+            return None
+        job = self.pipeline.submit()
+        print(f"Queued capture {job.capture_id}")
+        return job
+
+    def watch_keyboard(self):
+        print("\nPress Enter here (or F5 in the viewer) to take a photo; close the viewer to quit")
+        while not self.stopping.is_set():
+            try:
+                input()
+            except (EOFError, OSError):
+                return   # no terminal; F5 still works
+            self.capture()
+
+    def watch_gamepad(self):
+        import asyncio
+        import MV2
+        gamepad = MV2.find_gamepad()
+        if not gamepad:
+            print("No gamepad found; use Enter or F5 instead")
+            self.watch_keyboard()
+            return
+        print(f"Found gamepad: {gamepad.name}; press button {MV2.BUTTON} to take a photo")
+        asyncio.run(MV2.watch_gamepad(gamepad, self.pipeline))
+
+    def stop(self):
+        with self.lock:
+            self.stopping.set()
+            ready = self.ready.is_set()
+        # A camera still opening is stopped by the backend thread once it is up
+        if ready:
+            print("Stopping Claude pipeline...")
+            self.pipeline.stop()
+            print("Stopping camera...")
+            self.camera.stop()
+
+def run_system(trigger='keyboard', viewer=True):
+    backend = Backend(trigger)
+    if not viewer:
+        backend.start()
+        try:
+            backend.thread.join()
+        except KeyboardInterrupt:
+            print("\nShutting down system...")
+        finally:
+            backend.stop()
+        return
+
+    import Presentation
+    app = Presentation.ResponseViewer()
+    title = app.title()
+
+    def on_closing():
+        backend.stop()
+        app.on_closing()
+
+    def show_status():
+        # Tk only from the main thread, so the backend's status is polled
+        app.title(title if backend.status == "ready" else f"{title} ({backend.status}...)")
+        if backend.status != "ready" and not backend.status.startswith("failed"):
+            app.after(STATUS_POLL_MS, show_status)
+        elif backend.status.startswith("failed"):
+            app.title(f"{title} (camera {backend.status})")
+
+    def on_mapped():
+        print(f"Viewer ready {elapsed_ms():.0f} ms after launch")
+        backend.start()
+        show_status()
+
+    app.protocol("WM_DELETE_WINDOW", on_closing)
+    app.bind('<F5>', lambda event: backend.capture())
+    # Start the heavy imports once the window is on screen
+    app.update_idletasks()
+    app.after_idle(on_mapped)
+    try:
+        app.mainloop()
+    except KeyboardInterrupt:
+        print("\nShutting down system...")
+        on_closing()
+    # Let a camera that was still opening come up and be stopped, rather
+    # than exiting under it
+    if backend.thread.is_alive() and not backend.ready.is_set():
+        print("Waiting for the camera to finish opening...")
+        backend.thread.join()
+    print("System shutdown complete.")
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def import_times(statement):
+    """(module, self us, cumulative us, depth) for a statement run under
+    python -X importtime in a fresh interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1])
+    return rows
+
+def importtime_report(top=10):
+    """Import cost of what runs before the viewer is up and of what the
+    backend thread loads afterwards."""
+    phases = [
+        ("Before the viewer (main thread)", "import run, Presentation"),
+        ("Backend thread", "import camera_daemon, ClaudeCamd, pipeline"),
+    ]
+    for label, statement in phases:
+        rows = import_times(statement)
+        total = sum(row[1] for row in rows)
+        print(f"{label}: {total / 1000:.0f} ms importing {len(rows)} modules ({statement})")
+        # Top level imports of the statement, heaviest first
+        roots = sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])
+        for module, _, cumulative, _ in roots[:top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture screens and show Claude's responses, all in one process")
+    parser.add_argument("command", nargs="?", choices=["run", "importtime"], default="run")
+    trigger = parser.add_mutually_exclusive_group()
+    trigger.add_argument("--auto", action="store_true",
+                         help="capture automatically when the scene changes and settles")
+    trigger.add_argument("--gamepad", action="store_true", help="take photos with the gamepad button")
+    parser.add_argument("--no-viewer", action="store_true", help="run without the Tk window")
+    parser.add_argument("--top", type=int, default=10, help="modules to list for importtime")
+    args = parser.parse_args()
+
+    if args.command == "importtime":
+        importtime_report(args.top)
+        return
+
+    mode = 'auto' if args.auto else 'gamepad' if args.gamepad else 'keyboard'
+    run_system(mode, viewer=not args.no_viewer)
+
+if __name__ == "__main__":
+    main()
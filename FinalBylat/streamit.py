@@ -1,4 +1,5 @@
 import cv2
+import frame_source
 
 def find_max_resolution(cap):
     # Common resolutions to test (width, height)
@@ -25,30 +26,35 @@ def find_max_resolution(cap):
             
     return 640, 480  # Default fallback
 
-# Open camera
-cap = cv2.VideoCapture(0)
+def main():
+    # Open camera (or whichever FRAME_SOURCE is configured)
+    cap = frame_source.open_source()
 
-# Find and set the maximum supported resolution
-width, height = find_max_resolution(cap)
-print(f"Camera resolution: {width}x{height}")
+    # Find and set the maximum supported resolution
+    width, height = find_max_resolution(cap)
+    print(f"Camera resolution: {width}x{height}")
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-        
-    # Add resolution text to frame
-    resolution_text = f"{width}x{height}"
-    cv2.putText(frame, resolution_text, (10, 30), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                
-    # Show frame in window that matches camera resolution
-    cv2.namedWindow('Camera Test (Press Q to quit)', cv2.WINDOW_NORMAL)
-    cv2.resizeWindow('Camera Test (Press Q to quit)', width, height)
-    cv2.imshow('Camera Test (Press Q to quit)', frame)
-    
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        # Add resolution text to a copy; the frame may be shared (FRAME_SOURCE=ring)
+        frame = frame.copy()
+        resolution_text = f"{width}x{height}"
+        cv2.putText(frame, resolution_text, (10, 30), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        # Show frame in window that matches camera resolution
+        cv2.namedWindow('Camera Test (Press Q to quit)', cv2.WINDOW_NORMAL)
+        cv2.resizeWindow('Camera Test (Press Q to quit)', width, height)
+        cv2.imshow('Camera Test (Press Q to quit)', frame)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
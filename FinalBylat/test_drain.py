@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+# Settings are read at import time; keep requests in order and polling quick
+os.environ.update({
+    'ANTHROPIC_API_KEY': 'mock',
+    'API_CONCURRENCY': '1',
+    'API_STREAM': '0',
+    'BATCH_POLL_SECONDS': '0.05',
+    'CACHE_ENABLED': '0',
+    'TRACE_ENABLED': '0',
+})
+
+import cv2
+import numpy as np
+import mock_api
+from ClaudeCamd import PhotoProcessor
+
+class DrainTest(unittest.TestCase):
+    """--drain and --drain --batch against mock_api.py in a scratch directory."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.makedirs("ToClaude")
+        self.server = None
+        self.processor = None
+
+    def tearDown(self):
+        if self.processor:
+            self.processor.shutdown()
+            self.processor.store.close()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def start(self, **options):
+        self.server = mock_api.start_mock_server(latency=0.05, **options)
+        os.environ['ANTHROPIC_BASE_URL'] = self.server.url
+        self.processor = PhotoProcessor()
+        return self.processor
+
+    def make_backlog(self, count=4):
+        """Photos whose names sort newest first; returns their paths oldest first."""
+        now = time.time()
+        paths = []
+        for index in range(count):
+            path = os.path.join("ToClaude", f"image_{count - index:03d}.png")
+            image = np.full((120, 320, 3), 255, dtype=np.uint8)
+            cv2.putText(image, f"page {index}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+            cv2.imwrite(path, image)
+            os.utime(path, (now - 100 + index * 10, now - 100 + index * 10))
+            paths.append(path)
+        return paths
+
+    def stored(self):
+        store = self.processor.store
+        return [store.get(response_id) for response_id in range(1, store.count() + 1)]
+
+    def assert_drained(self, paths):
+        self.assertEqual(os.listdir("ToClaude"), [])
+        rows = self.stored()
+        self.assertEqual([row['source'] for row in rows], paths)
+        for row in rows:
+            self.assertEqual(row['status'], 'complete')
+            self.assertTrue(row['text'].startswith("Mock transcription"))
+
+    def test_drain_oldest_first(self):
+        processor = self.start()
+        paths = self.make_backlog()
+        self.assertEqual(processor.list_backlog(), paths)
+        processor.drain()
+        self.assert_drained(paths)
+
+    def test_drain_batch_oldest_first(self):
+        processor = self.start()
+        paths = self.make_backlog()
+        processor.drain_batch()
+        self.assert_drained(paths)
+
+    def test_errored_batch_entries_stay(self):
+        processor = self.start(error_rate=1.0)
+        paths = self.make_backlog(2)
+        processor.drain_batch()
+        self.assertEqual(sorted(os.listdir("ToClaude")), sorted(os.path.basename(path) for path in paths))
+        self.assertEqual(processor.store.count(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
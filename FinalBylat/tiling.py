@@ -0,0 +1,141 @@
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+import cv2
+import payload
+
+# High resolution captures are split into overlapping tiles that each fit
+# the model's limits, so small text isn't lost to the 1568 px downscale.
+# Tiling kicks in when the downscale would shrink the frame below
+# TILE_MIN_SCALE of its size.
+TILE_ENABLED = os.getenv('TILE_ENABLED', '1') == '1'
+TILE_SIZE = int(os.getenv('TILE_SIZE', '1024'))
+TILE_OVERLAP = int(os.getenv('TILE_OVERLAP', '160'))
+TILE_MIN_SCALE = float(os.getenv('TILE_MIN_SCALE', '0.75'))
+TILE_CONCURRENCY = int(os.getenv('TILE_CONCURRENCY', '8'))
+TILE_PROMPT = (
+    "This image is one tile cut from a larger picture of a screen, so text may be cut off at its edges. "
+    "Respond with exactly the text visible in this tile, line by line, keeping the line breaks, "
+    "and nothing else."
+)
+
+# Lines from neighbouring tiles count as the same when this similar
+LINE_MATCH = 0.8
+
+def needs_tiling(frame, min_scale=TILE_MIN_SCALE):
+    """True when sending the whole frame would downscale it too far."""
+    height, width = frame.shape[:2]
+    fit_width, _ = payload.fit_size(width, height)
+    return fit_width / width < min_scale
+
+def tile_origins(length, size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Evenly spaced tile starts along one axis, overlapping by at least `overlap`."""
+    if length <= size:
+        return [0]
+    count = math.ceil((length - overlap) / (size - overlap))
+    step = (length - size) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+def split_tiles(frame, size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Rows of (x, y, tile), top to bottom and left to right."""
+    height, width = frame.shape[:2]
+    return [
+        [(x, y, frame[y:y + size, x:x + size]) for x in tile_origins(width, size, overlap)]
+        for y in tile_origins(height, size, overlap)
+    ]
+
+def encode_tiles(frame, size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Rows of encoded (bytes, media_type) tiles, ready to send."""
+    return [[payload.prepare_frame(tile) for _, _, tile in row] for row in split_tiles(frame, size, overlap)]
+
+def load_tiles(path):
+    """Encoded tiles for an image on disk, or None when it fits as it is."""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None or not needs_tiling(image):
+        return None
+    return encode_tiles(image)
+
+def normalize(text):
+    return " ".join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+def similar_lines(a, b, threshold=LINE_MATCH):
+    a, b = normalize(a), normalize(b)
+    if not a or not b:
+        return False
+    return a == b or SequenceMatcher(None, a, b).ratio() >= threshold
+
+def similar_words(a, b, first, last):
+    """Words from overlapping tiles; the tile edges may cut the outer ones."""
+    a, b = normalize(a), normalize(b)
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    # b may start part way through a word, a may stop part way through one
+    return (first and a.endswith(b)) or (last and b.startswith(a))
+
+def overlap_length(first, second, match):
+    """Longest k where the last k items of first match the first k of second."""
+    for k in range(min(len(first), len(second)), 0, -1):
+        tail = first[-k:]
+        if all(match(a, b, i == 0, i == k - 1) for i, (a, b) in enumerate(zip(tail, second[:k]))):
+            return k
+    return 0
+
+def join_words(left, right):
+    """One text line seen by two side by side tiles."""
+    left_words, right_words = left.split(), right.split()
+    k = overlap_length(left_words, right_words, similar_words)
+    if not k:
+        return " ".join(left_words + right_words)
+    # Keep whichever copy of each overlapping word is more complete
+    shared = [max(a, b, key=len) for a, b in zip(left_words[-k:], right_words[:k])]
+    return " ".join(left_words[:-k] + shared + right_words[k:])
+
+def merge_row(texts):
+    """Merge tiles from one row, left to right.
+
+    When neighbours have the same number of lines they are the same text
+    lines cut in two and are joined line by line. Otherwise the tiles hold
+    different columns of text, which read one after the other.
+    """
+    lines = texts[0].strip().splitlines()
+    for text in texts[1:]:
+        right = text.strip().splitlines()
+        if len(right) == len(lines):
+            lines = [join_words(a, b) for a, b in zip(lines, right)]
+        else:
+            lines = lines + right
+    return lines
+
+def merge_rows(rows):
+    """Merge tile transcriptions (rows of texts) into one text in reading order,
+    dropping the lines repeated where rows overlap."""
+    merged = []
+    for row in rows:
+        lines = merge_row(row)
+        k = overlap_length(merged, lines, lambda a, b, first, last: similar_lines(a, b))
+        merged += lines[k:]
+    return "\n".join(merged)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def executor():
+    """Tile requests get their own threads; callers may already be running on
+    the API pool's executor and would deadlock waiting on it."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TILE_CONCURRENCY, thread_name_prefix="tile")
+        return _executor
+
+def transcribe(tiles, request):
+    """Send every tile at once with request(image_bytes, media_type) and merge
+    the texts; latency is roughly that of the slowest tile."""
+    pool = executor()
+    futures = [[pool.submit(request, data, media_type) for data, media_type in row] for row in tiles]
+    return merge_rows([[future.result() for future in row] for row in futures])
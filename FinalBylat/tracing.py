@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Stage spans keyed by capture id, appended as JSON lines by every process
+# (controller, watcher, viewer) so one file covers press to render. Off
+# by default: the file is never rotated, so turn it on for a profiling run.
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '0') == '1'
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+TRACE_PROM_FILE = os.getenv('TRACE_PROM_FILE', 'capture_latency.prom')
+
+# Histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Reading order for the summary; anything else is listed after these
+STAGE_ORDER = ('press', 'capture', 'gate', 'crop', 'denoise', 'backup', 'encode', 'write',
+               'pickup', 'api', 'persist', 'display', 'render')
+
+class Tracer:
+    """Appends spans to a JSONL file; one line per finished span."""
+
+    def __init__(self, path=TRACE_FILE, enabled=TRACE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.file = None
+
+    def record(self, capture_id, stage, start, end=None, **attributes):
+        """Record a span with wall clock start/end times (seconds)."""
+        if not self.enabled or capture_id is None:
+            return
+        end = time.time() if end is None else end
+        span = {"capture_id": capture_id, "stage": stage, "start": start, "end": end,
+                "ms": round((end - start) * 1000, 3), "pid": os.getpid()}
+        span.update(attributes)
+        line = json.dumps(span) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self.file.write(line)
+
+    @contextmanager
+    def span(self, capture_id, stage, **attributes):
+        start = time.time()
+        try:
+            yield attributes
+        finally:
+            self.record(capture_id, stage, start, **attributes)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+TRACER = Tracer()
+
+def record(capture_id, stage, start, end=None, **attributes):
+    TRACER.record(capture_id, stage, start, end, **attributes)
+
+def span(capture_id, stage, **attributes):
+    return TRACER.span(capture_id, stage, **attributes)
+
+def load_spans(path=TRACE_FILE, since=None):
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # a line cut short by a crash
+            if since is None or span["start"] >= since:
+                spans.append(span)
+    return spans
+
+def percentile(values, q):
+    """Linear interpolation between closest ranks; values must be sorted."""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def stage_durations(spans):
+    """Sorted durations in ms per stage, plus 'total' from first start to
+    last end of each capture."""
+    durations = defaultdict(list)
+    captures = {}
+    for span in spans:
+        durations[span["stage"]].append(span["ms"])
+        start, end = captures.get(span["capture_id"], (span["start"], span["end"]))
+        captures[span["capture_id"]] = (min(start, span["start"]), max(end, span["end"]))
+    durations["total"] = [(end - start) * 1000 for start, end in captures.values()]
+    return {stage: sorted(values) for stage, values in durations.items() if values}
+
+def ordered_stages(durations):
+    known = [stage for stage in STAGE_ORDER if stage in durations]
+    others = sorted(stage for stage in durations if stage not in STAGE_ORDER and stage != 'total')
+    return known + others + (['total'] if 'total' in durations else [])
+
+def summarize(spans):
+    """Rows of (stage, count, p50, p95, p99, max) in ms."""
+    durations = stage_durations(spans)
+    return [
+        (stage, len(durations[stage]), *(percentile(durations[stage], q) for q in QUANTILES), durations[stage][-1])
+        for stage in ordered_stages(durations)
+    ]
+
+def prometheus_text(spans):
+    """Histogram and quantile summary per stage in the Prometheus text format."""
+    durations = stage_durations(spans)
+    lines = [
+        "# HELP cykabylat_stage_seconds Time spent in each capture stage.",
+        "# TYPE cykabylat_stage_seconds histogram",
+    ]
+    for stage in ordered_stages(durations):
+        seconds = [ms / 1000 for ms in durations[stage]]
+        for bucket in BUCKETS:
+            lines.append(f'cykabylat_stage_seconds_bucket{{stage="{stage}",le="{bucket}"}} '
+                         f'{sum(1 for s in seconds if s <= bucket)}')
+        lines.append(f'cykabylat_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {len(seconds)}')
+        lines.append(f'cykabylat_stage_seconds_sum{{stage="{stage}"}} {sum(seconds):.6f}')
+        lines.append(f'cykabylat_stage_seconds_count{{stage="{stage}"}} {len(seconds)}')
+
+    lines += [
+        "# HELP cykabylat_stage_quantile_seconds Stage latency quantiles over the trace file.",
+        "# TYPE cykabylat_stage_quantile_seconds gauge",
+    ]
+    for stage in ordered_stages(durations):
+        for q in QUANTILES:
+            value = percentile(durations[stage], q) / 1000
+            lines.append(f'cykabylat_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(spans, path=TRACE_PROM_FILE):
+    """Write the textfile atomically so node_exporter never reads half of it."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(spans))
+    os.replace(temp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize capture traces")
+    parser.add_argument("--file", default=TRACE_FILE)
+    parser.add_argument("--last", type=float, help="only spans from the last N minutes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("summary", help="per stage latency percentiles")
+
+    prom = commands.add_parser("prom", help="write a Prometheus textfile")
+    prom.add_argument("--out", default=TRACE_PROM_FILE)
+
+    show = commands.add_parser("show", help="spans for one capture")
+    show.add_argument("capture_id")
+
+    args = parser.parse_args()
+    since = time.time() - args.last * 60 if args.last else None
+    spans = load_spans(args.file, since)
+
+    if args.command == "summary":
+        captures = len({span["capture_id"] for span in spans})
+        print(f"{len(spans)} spans from {captures} captures in {args.file}")
+        print(f"{'stage':<10} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for stage, count, p50, p95, p99, longest in summarize(spans):
+            print(f"{stage:<10} {count:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {longest:>9.1f}")
+    elif args.command == "prom":
+        write_prometheus(spans, args.out)
+        print(f"Wrote {args.out}")
+    elif args.command == "show":
+        spans = sorted((s for s in spans if s["capture_id"] == args.capture_id), key=lambda s: s["start"])
+        if not spans:
+            print(f"No spans for {args.capture_id}")
+        origin = spans[0]["start"] if spans else 0
+        for span in spans:
+            print(f"+{(span['start'] - origin) * 1000:8.1f} ms  {span['stage']:<10} {span['ms']:9.1f} ms")
+
+if __name__ == "__main__":
+    main()